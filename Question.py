@@ -1,19 +1,60 @@
+import difflib
+import json
+import re
 import uuid
 from typing import List, Optional
 
+from config.settings import SECTIONS, DIFFICULTIES, SECTION_TAGS
+
+OPTION_KEYS = "ABCDEFGH"
+
+def _tag_key(tag: str) -> str:
+    """Loose comparison key: lowercase, curly quotes straightened, punctuation and spacing collapsed."""
+    tag = tag.replace("’", "'").replace("‘", "'").lower()
+    return re.sub(r"[^a-z0-9']+", " ", tag).strip()
+
+def normalize_tags(tags, section: str) -> list:
+    """
+    Maps model-proposed tags onto SECTION_TAGS[section] locally, without an LLM call.
+    Exact and loosely-equal matches are kept, near misses are snapped to the closest
+    allowed tag, and anything else is dropped. Returns [] if nothing valid remains.
+    """
+    allowed = SECTION_TAGS.get(section, [])
+    by_key = {_tag_key(t): t for t in allowed}
+    if isinstance(tags, str):
+        tags = [tags]
+
+    normalized = []
+    for tag in tags or []:
+        if not isinstance(tag, str):
+            continue
+        match = by_key.get(_tag_key(tag))
+        if match is None:
+            close = difflib.get_close_matches(_tag_key(tag), list(by_key), n=1, cutoff=0.8)
+            match = by_key[close[0]] if close else None
+        if match and match not in normalized:
+            normalized.append(match)
+    return normalized
+
 class Question:
-    def __init__(self, question_text: str, options: dict, correct: str, difficulty: str, section: str, tags: List[str], image_url: Optional[str] = None):
-        self.question_id = str(uuid.uuid4())  # unique id
+    __slots__ = ("question_id", "question_text", "options", "correct", "difficulty", "section", "tags", "image_url", "duplicate_of")
+
+    def __init__(self, question_text: str, options: dict, correct: str, difficulty: str, section: str, tags: List[str], image_url: Optional[str] = None, question_id: Optional[str] = None, duplicate_of: Optional[str] = None):
+        self.question_id = question_id or str(uuid.uuid4())  # unique id
         self.question_text = question_text
         self.options = options  # {"A": "...", "B": "...", ...}
         self.correct = correct  # "A" / "B" / ...
         self.difficulty = difficulty  # "easy" / "medium" / "hard"
-        self.section = section  # "maths" / "reading" / "writing"
+        self.section = section  # "math" / "reading" / "writing"
         self.tags = tags
-        self.image_url = image_url 
+        self.image_url = image_url
+        self.duplicate_of = duplicate_of  # set when flagged as a near-duplicate
+
+    def __repr__(self):
+        return f"Question({self.question_id!r}, {self.section}/{self.difficulty}, {self.question_text[:40]!r})"
 
     def to_dict(self):
-        return {
+        data = {
             "question_id": self.question_id,
             "question_text": self.question_text,
             "options": self.options,
@@ -23,6 +64,9 @@ class Question:
             "tags": self.tags,
             "image_url": self.image_url
         }
+        if self.duplicate_of:
+            data["duplicate_of"] = self.duplicate_of
+        return data
 
     @staticmethod
     def from_dict(data: dict):
@@ -33,5 +77,120 @@ class Question:
             difficulty=data["difficulty"],
             section=data["section"],
             tags=data["tags"],
-            image_url=data.get("image_url")  # Optional field
+            image_url=data.get("image_url"),  # Optional field
+            question_id=data.get("question_id"),
+            duplicate_of=data.get("duplicate_of")
+        )
+
+    @staticmethod
+    def from_model_output(data: dict, section: str = None, difficulty: str = None, image_url: str = None):
+        """
+        Validates and normalizes one question from LLM output. Returns (question, None)
+        or (None, reason). Repairs what it safely can: options given as a list become
+        A/B/C/..., keys and the correct letter are upper-cased, "B)"-style or full-text
+        answers are mapped back to their key, and tags are snapped onto SECTION_TAGS.
+        Tags may end up empty, meaning the question still needs tagging.
+        """
+        if not isinstance(data, dict):
+            return None, "not an object"
+
+        text = data.get("question_text")
+        if not isinstance(text, str) or not text.strip():
+            return None, "missing question_text"
+
+        section = str(section or data.get("section") or "").strip().lower()
+        difficulty = str(difficulty or data.get("difficulty") or "").strip().lower()
+        if section not in SECTIONS:
+            return None, f"unknown section {section!r}"
+        if difficulty not in DIFFICULTIES:
+            return None, f"unknown difficulty {difficulty!r}"
+
+        options = data.get("options")
+        if isinstance(options, list):
+            options = dict(zip(OPTION_KEYS, options))
+        if not isinstance(options, dict):
+            return None, "options is not an object"
+        options = {str(key).strip().strip(").").upper(): str(value).strip() for key, value in options.items() if value is not None}
+        if len(options) < 2 or any(not value for value in options.values()):
+            return None, "fewer than two non-empty options"
+
+        correct = str(data.get("correct", "")).strip()
+        if correct.upper() not in options:
+            letter = correct[:1].upper()
+            by_text = [key for key, value in options.items() if value.lower() == correct.lower()]
+            if len(by_text) == 1:
+                correct = by_text[0]
+            elif letter in options and re.fullmatch(r"[A-Za-z][).:]?(\s.*)?", correct):
+                correct = letter
+            else:
+                return None, f"correct answer {correct!r} is not one of the options"
+        correct = correct.upper()
+
+        question = Question(
+            question_text=text.strip(),
+            options=options,
+            correct=correct,
+            difficulty=difficulty,
+            section=section,
+            tags=normalize_tags(data.get("tags"), section),
+            image_url=image_url or data.get("image_url")
+        )
+        return question, None
+
+# --- Bulk serialization ---
+
+def questions_to_jsonl(questions: list, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        for question in questions:
+            f.write(json.dumps(question.to_dict(), ensure_ascii=False, separators=(",", ":")) + "\n")
+
+def questions_from_jsonl(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [Question.from_dict(json.loads(line)) for line in f if line.strip()]
+
+def questions_to_columns(questions: list) -> dict:
+    """
+    Columnar form: one list per field. Section, difficulty and tags are dictionary-encoded
+    as small integer codes, which keeps large banks compact in memory and on disk.
+    """
+    tag_vocab = {}
+    columns = {
+        "question_id": [], "question_text": [], "options": [], "correct": [],
+        "difficulty": [], "section": [], "tags": [], "image_url": [], "duplicate_of": [],
+        "_sections": SECTIONS, "_difficulties": DIFFICULTIES,
+    }
+    for q in questions:
+        columns["question_id"].append(q.question_id)
+        columns["question_text"].append(q.question_text)
+        columns["options"].append(q.options)
+        columns["correct"].append(q.correct)
+        columns["difficulty"].append(DIFFICULTIES.index(q.difficulty))
+        columns["section"].append(SECTIONS.index(q.section))
+        columns["tags"].append([tag_vocab.setdefault(tag, len(tag_vocab)) for tag in q.tags])
+        columns["image_url"].append(q.image_url)
+        columns["duplicate_of"].append(q.duplicate_of)
+    columns["_tags"] = list(tag_vocab)
+    return columns
+
+def questions_from_columns(columns: dict) -> list:
+    sections, difficulties, tags = columns["_sections"], columns["_difficulties"], columns["_tags"]
+    return [
+        Question(
+            question_text=text, options=options, correct=correct,
+            difficulty=difficulties[difficulty], section=sections[section],
+            tags=[tags[code] for code in tag_codes], image_url=image_url,
+            question_id=question_id, duplicate_of=duplicate_of
         )
+        for question_id, text, options, correct, difficulty, section, tag_codes, image_url, duplicate_of in zip(
+            columns["question_id"], columns["question_text"], columns["options"], columns["correct"],
+            columns["difficulty"], columns["section"], columns["tags"], columns["image_url"], columns["duplicate_of"]
+        )
+    ]
+
+def save_columns(questions: list, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(questions_to_columns(questions), f, ensure_ascii=False, separators=(",", ":"))
+
+def load_columns(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return questions_from_columns(json.load(f))
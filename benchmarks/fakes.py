@@ -0,0 +1,213 @@
+"""
+Offline stand-ins for the OpenAI, Firestore and Cloud Storage clients with
+configurable latency, used by the benchmark suite. install() must run before
+any module that imports google.cloud.firestore or google.cloud.storage.
+"""
+import itertools
+import json
+import random
+import re
+import sys
+import threading
+import time
+import types
+
+from config.settings import SECTION_TAGS
+
+WORDS = (
+    "slope intercept parabola vertex ratio percent median mean probability triangle "
+    "circle radius volume cylinder function domain exponent radical polynomial factor "
+    "system inequality graph table scatterplot sine cosine tangent angle area growth"
+).split()
+
+
+def _sleep(latency: float):
+    if latency > 0:
+        # +/-25% jitter so concurrent requests don't finish in lockstep
+        time.sleep(latency * random.uniform(0.75, 1.25))
+
+
+class FakeChatCompletions:
+    """Answers generation and tagging prompts with well-formed JSON after `latency` seconds."""
+
+    def __init__(self, latency: float = 0.5, tagging_latency: float = None, failure_rate: float = 0.0):
+        self.latency = latency
+        self.tagging_latency = latency / 3 if tagging_latency is None else tagging_latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _text(self, messages) -> str:
+        parts = []
+        for message in messages:
+            content = message["content"]
+            parts.extend([content] if isinstance(content, str) else [p.get("text", "") for p in content])
+        return "\n".join(parts)
+
+    def _question(self, section: str, difficulty: str) -> dict:
+        n = next(self._ids)
+        stem = " ".join(random.choice(WORDS) for _ in range(30))
+        return {
+            "section": section,
+            "difficulty": difficulty,
+            "question_text": f"Question {n}: {stem}?",
+            "options": {key: f"{key}{n} {random.choice(WORDS)}" for key in "ABCD"},
+            "correct": random.choice("ABCD"),
+            "tags": [random.choice(SECTION_TAGS[section])],
+        }
+
+    def create(self, model: str, messages: list, **kwargs):
+        with self._lock:
+            self.calls += 1
+        prompt = self._text(messages)
+        is_generation = "### Your Task" in prompt
+        _sleep(self.latency if is_generation else self.tagging_latency)
+
+        if random.random() < self.failure_rate:
+            error = RuntimeError("fake 503")
+            error.status_code = 503
+            raise error
+
+        if is_generation:
+            combos = re.search(r"combinations: (.*)", prompt).group(1).split(", ")
+            count = int(re.search(r"generate exactly (\d+)", prompt).group(1))
+            questions = [self._question(*combo.split("/")) for combo in combos for _ in range(count)]
+            content = json.dumps({"questions": questions})
+        elif "QUESTION 0:" in prompt:
+            tags = json.loads(prompt.rsplit("AVAILABLE TAGS:", 1)[1])
+            count = len(re.findall(r"^QUESTION \d+:", prompt, flags=re.M))
+            content = json.dumps({"results": [{"index": i, "tags": [tags[0]]} for i in range(count)]})
+        else:
+            tags = json.loads(prompt.rsplit("AVAILABLE TAGS:", 1)[1])
+            content = json.dumps({"tags": [tags[0]]})
+
+        usage = types.SimpleNamespace(
+            prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4,
+            prompt_tokens_details=types.SimpleNamespace(cached_tokens=0)
+        )
+        message = types.SimpleNamespace(content=content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+
+
+class FakeFirestore:
+    """In-memory Firestore client; every set() and batch commit costs one RPC of `latency` seconds."""
+
+    SERVER_TIMESTAMP = object()
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.documents = {}
+        self.rpcs = 0
+        self._lock = threading.Lock()
+
+    def _rpc(self, writes: list):
+        _sleep(self.latency)
+        with self._lock:
+            self.rpcs += 1
+            for path, data in writes:
+                self.documents[path] = data
+
+    def collection(self, path: str):
+        client = self
+
+        class Document:
+            def __init__(self, document_id):
+                self.path = f"{path}/{document_id}"
+
+            def set(self, data):
+                client._rpc([(self.path, data)])
+
+        class Collection:
+            def document(self, document_id):
+                return Document(document_id)
+
+            def stream(self):
+                prefix = path + "/"
+                return [
+                    types.SimpleNamespace(id=key[len(prefix):], to_dict=lambda data=data: dict(data))
+                    for key, data in list(client.documents.items()) if key.startswith(prefix) and "/" not in key[len(prefix):]
+                ]
+
+        return Collection()
+
+    def batch(self):
+        client = self
+
+        class Batch:
+            def __init__(self):
+                self.writes = []
+
+            def set(self, ref, data):
+                self.writes.append((ref.path, data))
+
+            def commit(self):
+                client._rpc(self.writes)
+
+        return Batch()
+
+
+class FakeStorage:
+    """In-memory Cloud Storage bucket with `latency` seconds per upload."""
+
+    def __init__(self, latency: float = 0.1):
+        self.latency = latency
+        self.blobs = {}
+        self.uploads = 0
+
+    def bucket(self, name: str):
+        storage = self
+
+        class Blob:
+            def __init__(self, blob_name):
+                self.name = blob_name
+                self.metadata = None
+                self.public_url = f"https://storage.example/{name}/{blob_name}"
+
+            def upload_from_filename(self, path):
+                _sleep(storage.latency)
+                storage.uploads += 1
+                storage.blobs[self.name] = self
+
+            def make_public(self):
+                pass
+
+        class Bucket:
+            def blob(self, blob_name):
+                return Blob(blob_name)
+
+            def get_blob(self, blob_name):
+                return storage.blobs.get(blob_name)
+
+        return Bucket()
+
+
+def _module(name: str, **attrs):
+    module = types.ModuleType(name)
+    module.__path__ = []
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+def install(llm_latency: float = 0.5, firestore_latency: float = 0.05, storage_latency: float = 0.1, failure_rate: float = 0.0):
+    """
+    Replaces the OpenAI, Firestore and Cloud Storage clients with fakes.
+    Returns (chat_completions, firestore_client, storage_client) for inspecting call counts.
+    """
+    firestore_client = FakeFirestore(firestore_latency)
+    storage_client = FakeStorage(storage_latency)
+    chat_completions = FakeChatCompletions(llm_latency, failure_rate=failure_rate)
+
+    for name in ("google", "google.cloud"):
+        if name not in sys.modules:
+            _module(name)
+    sys.modules["google"].cloud = sys.modules["google.cloud"]
+    sys.modules["google.cloud"].firestore = _module(
+        "google.cloud.firestore", Client=lambda *a, **k: firestore_client, SERVER_TIMESTAMP=FakeFirestore.SERVER_TIMESTAMP
+    )
+    sys.modules["google.cloud"].storage = _module("google.cloud.storage", Client=lambda *a, **k: storage_client)
+
+    import pipeline.pipeline
+    pipeline.pipeline.openai = types.SimpleNamespace(chat=types.SimpleNamespace(completions=chat_completions))
+    return chat_completions, firestore_client, storage_client
@@ -0,0 +1,156 @@
+"""
+Offline end-to-end benchmark: runs main.run() on a synthetic PDF against fake
+OpenAI/Firestore/Cloud Storage clients with configurable latency, and reports
+wall time, throughput and the per-stage metrics of each mode.
+
+Usage:
+    python -m benchmarks.run_benchmark --pages 20 --llm-latency 0.8
+    python -m benchmarks.run_benchmark --mode streaming --no-figures --output bench.json
+    python -m benchmarks.run_benchmark --storage sqlite   # generate locally, then sync to Firestore
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="qb-bench-")
+
+# Settings are read at import time, so point state at a scratch directory and lift the
+# rate limits before anything from the pipeline is imported
+os.environ.update({
+    "RESPONSE_CACHE_PATH": "",
+    "CHECKPOINT_DIR": os.path.join(WORKDIR, "checkpoints"),
+    "DEDUP_INDEX_PATH": os.path.join(WORKDIR, "dedup_index.npz"),
+    "METRICS_PATH": os.path.join(WORKDIR, "metrics.json"),
+    "BANK_SNAPSHOT_PATH": os.path.join(WORKDIR, "bank_snapshot.jsonl"),
+    "LOCAL_IMAGE_DIR": os.path.join(WORKDIR, "images"),
+    "OPENAI_REQUESTS_PER_MINUTE": "1000000",
+    "OPENAI_TOKENS_PER_MINUTE": "1000000000",
+})
+
+import fitz  # PyMuPDF
+
+from benchmarks import fakes
+
+PARAGRAPH = (
+    "A linear function has a constant rate of change, so its graph is a line with slope m and "
+    "y-intercept b. When two quantities grow by the same percent each period, the relationship is "
+    "exponential rather than linear. The median of a data set is less sensitive to outliers than the "
+    "mean. In a right triangle, the sine of an acute angle is the ratio of the opposite side to the "
+    "hypotenuse, and the area of a circle with radius r is pi times r squared. "
+)
+
+
+def make_pdf(path: str, pages: int, figures_dir: str = None):
+    """Writes a text-heavy PDF; with `figures_dir`, each page also gets one of its images."""
+    images = []
+    if figures_dir and os.path.isdir(figures_dir):
+        images = sorted(os.path.join(figures_dir, name) for name in os.listdir(figures_dir) if name.lower().endswith(".png"))
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        text = f"Section {n + 1}\n\n" + "\n\n".join(PARAGRAPH for _ in range(4))
+        page.insert_textbox(fitz.Rect(72, 72, 540, 500 if images else 770), text, fontsize=9)
+        if images:
+            page.insert_image(fitz.Rect(150, 520, 450, 760), filename=images[n % len(images)])
+    doc.save(path)
+    doc.close()
+
+
+def reset_state():
+    for name in ("checkpoints", "dedup_index.npz", "figures"):
+        path = os.path.join(WORKDIR, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def run_mode(pdf_path: str, streaming: bool, include_figures: bool, num_questions: int, section: str) -> dict:
+    import main
+    from pipeline.metrics import metrics
+
+    reset_state()
+    metrics.reset()
+    started = time.perf_counter()
+    main.run(pdf_path, section, num_questions, include_figures=include_figures,
+             use_streaming_pipeline=streaming, figures_dir=os.path.join(WORKDIR, "figures"))
+    elapsed = time.perf_counter() - started
+
+    summary = metrics.summary()
+    uploaded = summary["counters"].get("questions.uploaded", 0)
+    summary["benchmark"] = {
+        "mode": "streaming" if streaming else "batched",
+        "wall_time_s": round(elapsed, 3),
+        "questions_uploaded": uploaded,
+        "questions_per_s": round(uploaded / elapsed, 3) if elapsed else None,
+    }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark with fake API clients.")
+    parser.add_argument("--pages", type=int, default=10, help="Pages in the synthetic PDF")
+    parser.add_argument("--section", default="math")
+    parser.add_argument("--num-questions", type=int, default=1, help="Questions per chunk and difficulty")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per generation call (tagging calls take a third)")
+    parser.add_argument("--firestore-latency", type=float, default=0.05, help="Seconds per Firestore commit")
+    parser.add_argument("--storage-latency", type=float, default=0.1, help="Seconds per GCS upload")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of LLM calls failing with a retryable 503")
+    parser.add_argument("--storage", choices=("firestore", "sqlite"), default="firestore",
+                        help="sqlite writes to a local bank and times a sync to (fake) Firestore after each run")
+    parser.add_argument("--mode", choices=("streaming", "batched", "both"), default="both")
+    parser.add_argument("--no-figures", action="store_true", help="Skip figure extraction and image questions")
+    parser.add_argument("--figures-from", default="extracted_images", help="Directory of PNGs to embed in the PDF")
+    parser.add_argument("--output", help="Write the full results as JSON to this path")
+    args = parser.parse_args()
+
+    include_figures = not args.no_figures
+    chat, firestore_client, storage_client = fakes.install(args.llm_latency, args.firestore_latency, args.storage_latency, args.failure_rate)
+
+    bank = None
+    if args.storage == "sqlite":
+        from database.storage import use_backend
+        bank = use_backend("sqlite", path=os.path.join(WORKDIR, "bank.sqlite"))
+
+    pdf_path = os.path.join(WORKDIR, "synthetic.pdf")
+    make_pdf(pdf_path, args.pages, args.figures_from if include_figures else None)
+
+    modes = [True, False] if args.mode == "both" else [args.mode == "streaming"]
+    results = []
+    try:
+        for streaming in modes:
+            calls_before, rpcs_before = chat.calls, firestore_client.rpcs
+            summary = run_mode(pdf_path, streaming, include_figures, args.num_questions, args.section)
+            if bank is not None:
+                started = time.perf_counter()
+                bank.sync()
+                summary["benchmark"]["sync_s"] = round(time.perf_counter() - started, 3)
+            summary["benchmark"].update(llm_calls=chat.calls - calls_before, firestore_rpcs=firestore_client.rpcs - rpcs_before)
+            results.append(summary)
+    finally:
+        if bank is not None:
+            bank.close()
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+    print("\n=== Benchmark results ===")
+    print(f"{args.pages} pages, LLM {args.llm_latency}s, Firestore {args.firestore_latency}s, GCS {args.storage_latency}s")
+    for summary in results:
+        bench = summary["benchmark"]
+        print(f"{bench['mode']:>9}: {bench['wall_time_s']:7.2f}s  {bench['questions_uploaded']:4d} questions  "
+              f"{bench['questions_per_s']:6.2f} q/s  {bench['llm_calls']:4d} LLM calls  {bench['firestore_rpcs']:4d} Firestore RPCs  "
+              f"est. ${summary['estimated_cost_usd']:.4f}" + (f"  sync {bench['sync_s']:.2f}s" if "sync_s" in bench else ""))
+        for stage, stats in summary["stages"].items():
+            print(f"           {stage:<32} n={stats['count']:<5} p50={stats['p50_s']:.3f}s p90={stats['p90_s']:.3f}s total={stats['total_s']:.2f}s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
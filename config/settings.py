@@ -9,6 +9,53 @@ GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 # OpenAI API key
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# OpenAI throughput settings (tune these to your account's rate limits)
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "8"))
+REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "30000"))
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+
+# Bound on items waiting between two stages of the streaming pipeline
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "32"))
+
+# On-disk LLM response cache and run checkpoints (set RESPONSE_CACHE_PATH="" to disable the cache)
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", ".cache/llm_responses.sqlite")
+RESPONSE_CACHE_MAX_MB = int(os.getenv("RESPONSE_CACHE_MAX_MB", "512"))
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "checkpoints")
+
+# PDF chunking budget (~4 characters per token, so 500 tokens is roughly the old 2000-character chunk)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "500"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+
+# Pre-generation chunk selection: send at most CHUNK_BUDGET chunks (0 = no cap) or CHUNK_BUDGET_RATIO
+# of each source's chunks to the LLM, choosing a diverse subset that covers the section's tags.
+# Tables of contents, indexes and front matter are skipped whenever a budget is set.
+CHUNK_BUDGET = int(os.getenv("CHUNK_BUDGET", "0"))
+CHUNK_BUDGET_RATIO = float(os.getenv("CHUNK_BUDGET_RATIO", "1.0"))
+
+# Near-duplicate detection before upload (estimated Jaccard similarity of question text + options)
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", ".cache/dedup_index.npz")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+
+# Per-run telemetry (stage latencies, token usage, cost, Firestore ops) is written here
+METRICS_PATH = os.getenv("METRICS_PATH", "metrics/last_run.json")
+
+# Where questions are written: "firestore", or "sqlite" for a local bank at LOCAL_BANK_PATH
+# that can be pushed to Firestore later with `python -m database.local sync`. With the local
+# bank, figures are kept in LOCAL_IMAGE_DIR instead of GCS and uploaded by the sync
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore")
+LOCAL_BANK_PATH = os.getenv("LOCAL_BANK_PATH", "local_bank/questions.sqlite")
+LOCAL_IMAGE_DIR = os.getenv("LOCAL_IMAGE_DIR", "local_bank/images")
+
+# Local copy of the quiz_questions collection used for quiz assembly
+BANK_SNAPSHOT_PATH = os.getenv("BANK_SNAPSHOT_PATH", ".cache/bank_snapshot.jsonl")
+
+# PDF figure extraction: drop images smaller than this many pixels on a side, with lower
+# grayscale entropy (bits), or appearing on more pages than this (logos, headers)
+FIGURE_MIN_SIDE = int(os.getenv("FIGURE_MIN_SIDE", "100"))
+FIGURE_MIN_ENTROPY = float(os.getenv("FIGURE_MIN_ENTROPY", "0.5"))
+FIGURE_MAX_REPEATS = int(os.getenv("FIGURE_MAX_REPEATS", "2"))
+
 # Predefined SAT sections and difficulty levels
 SECTIONS = ["math", "reading", "writing"]
 DIFFICULTIES = ["easy", "medium", "hard"]
@@ -1,47 +1,84 @@
-import uuid
+import threading
+from datetime import datetime
+
 from google.cloud import firestore
+from database.storage import StorageBackend
+# Kept importable from here for existing callers; they write through the configured backend
+from database.storage import upload_question, upload_questions, create_quiz_entry
+from pipeline.metrics import metrics
 
-db = firestore.Client()
+# Firestore rejects batches with more than 500 writes
+MAX_BATCH_WRITES = 500
 
-def upload_question(question_data: dict) -> str:
-    """
-    Uploads a question ID to the SAT index collection and the full data
-    to the quiz_questions collection.
-    """
-    question_id = str(uuid.uuid4())
-    section = question_data["section"]
-    difficulty = question_data["difficulty"]
-    tags = question_data.get("tags", [])
-
-    if not tags:
-        tags.append("untagged")
-
-    index_data = {"question_id": question_id}
-
-    for tag in tags:
-        safe_tag = tag.replace("/", "_").replace(" ", "-")
-        path = f"SAT/{section}/{difficulty}/{safe_tag}/questions"
-        db.collection(path).document(question_id).set(index_data)
-
-    print(f"Indexed question {question_id} in SAT collection under {len(tags)} tags.")
-
-    final_question_data = {
-        "question_id": question_id,
-        "question_text": question_data["question_text"],
-        "options": question_data["options"],
-        "correct": question_data["correct"],
-        "difficulty": difficulty,
-        "section": section,
-        "tags": tags,
-        "image_url": question_data.get("image_url", None) # Safely get image_url
-    }
-    
-    create_quiz_entry(question_id, final_question_data)
-    return question_id
-
-def create_quiz_entry(question_id: str, question_data: dict):
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
     """
-    Saves the complete question data to the main quiz_questions collection.
+    Returns the Firestore client shared by all threads, created on first use so that
+    importing this module needs no credentials. The client multiplexes concurrent
+    requests over its own gRPC channel pool, so one per process is enough.
     """
-    db.collection("quiz_questions").document(question_id).set(question_data)
-    print(f"Saved full data for {question_id} in quiz_questions collection.")
\ No newline at end of file
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = firestore.Client()
+    return _client
+
+class FirestoreBackend(StorageBackend):
+    name = "firestore"
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client or get_client()
+
+    def write(self, groups: list, on_commit=None):
+        """
+        Writes groups of documents with batched writes of up to MAX_BATCH_WRITES. A group
+        never straddles two batches, so each lands atomically. `on_commit(groups)` is
+        called after each batch with the groups it contained.
+        """
+        db = self.client
+        batch, pending, in_batch = db.batch(), 0, []
+
+        def commit():
+            with metrics.timer("firestore.batch_commit"):
+                batch.commit()
+            metrics.count("firestore.commits")
+            metrics.count("firestore.writes", pending)
+            if on_commit:
+                on_commit(in_batch)
+
+        for writes in groups:
+            if pending and pending + len(writes) > MAX_BATCH_WRITES:
+                commit()
+                batch, pending, in_batch = db.batch(), 0, []
+            for path, document_id, data in writes:
+                if path == "quiz_questions":
+                    # Lets bank snapshots refresh incrementally
+                    data = dict(data, updated_at=firestore.SERVER_TIMESTAMP)
+                batch.set(db.collection(path).document(document_id), data)
+            pending += len(writes)
+            in_batch.append(writes)
+
+        if pending:
+            commit()
+
+    def create_quiz_entry(self, question_id: str, question_data: dict):
+        data = dict(question_data, updated_at=firestore.SERVER_TIMESTAMP)
+        self.client.collection("quiz_questions").document(question_id).set(data)
+        metrics.count("firestore.writes")
+
+    def iter_quiz_questions(self, since: str = None):
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        query = self.client.collection("quiz_questions")
+        if since:
+            query = query.where(filter=FieldFilter("updated_at", ">", datetime.fromisoformat(since))).order_by("updated_at")
+        for doc in query.stream():
+            data = doc.to_dict()
+            data.setdefault("question_id", doc.id)
+            yield data
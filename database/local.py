@@ -0,0 +1,180 @@
+"""
+Local question bank in SQLite, laid out exactly like the Firestore collections, so
+generation can run at full speed offline and be uploaded once.
+
+    # Generate into the local bank
+    STORAGE_BACKEND=sqlite python main.py
+
+    # Push everything not yet uploaded to Firestore in batched writes (figures kept in
+    # LOCAL_IMAGE_DIR are uploaded to GCS first)
+    python -m database.local sync
+
+    # Documents per collection prefix and how many are still unsynced
+    python -m database.local stats
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from config.settings import LOCAL_BANK_PATH, LOCAL_IMAGE_DIR
+from database.storage import StorageBackend
+from pipeline.metrics import metrics
+
+
+def _now() -> str:
+    # Fixed-width ISO timestamps compare correctly as strings
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Stores every document under its Firestore (collection path, document ID), so the
+    SAT index layout is preserved. Each write() is a single transaction, which makes
+    bulk inserts cheap. Documents remember when they were last pushed to Firestore,
+    so sync() only uploads what changed. Safe to share between threads.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = LOCAL_BANK_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "collection TEXT NOT NULL, document_id TEXT NOT NULL, data TEXT NOT NULL, "
+            "updated_at TEXT NOT NULL, synced_at TEXT, PRIMARY KEY (collection, document_id))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS documents_unsynced ON documents (document_id) WHERE synced_at IS NULL")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS documents_updated_at ON documents (collection, updated_at)")
+        self.conn.commit()
+
+    def write(self, groups: list):
+        updated_at = _now()
+        rows = [
+            (path, document_id, json.dumps(data, ensure_ascii=False, separators=(",", ":")), updated_at)
+            for writes in groups for path, document_id, data in writes
+        ]
+        with metrics.timer("sqlite.commit"), self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO documents (collection, document_id, data, updated_at, synced_at) VALUES (?, ?, ?, ?, NULL)",
+                rows
+            )
+            self.conn.commit()
+        metrics.count("sqlite.writes", len(rows))
+
+    def iter_quiz_questions(self, since: str = None):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT data, updated_at FROM documents WHERE collection = 'quiz_questions' AND updated_at > ? ORDER BY updated_at",
+                (since or "",)
+            ).fetchall()
+        for data, updated_at in rows:
+            yield dict(json.loads(data), updated_at=updated_at)
+
+    def unsynced_groups(self) -> list:
+        """Documents not yet in Firestore, grouped by question ID (its index entries plus its quiz_questions document)."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT collection, document_id, data FROM documents WHERE synced_at IS NULL ORDER BY document_id, collection"
+            ).fetchall()
+        groups, current_id = [], None
+        for collection, document_id, data in rows:
+            if document_id != current_id:
+                groups.append([])
+                current_id = document_id
+            groups[-1].append((collection, document_id, json.loads(data)))
+        return groups
+
+    def mark_synced(self, writes: list):
+        synced_at = _now()
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE documents SET synced_at = ? WHERE collection = ? AND document_id = ?",
+                [(synced_at, path, document_id) for path, document_id, _ in writes]
+            )
+            self.conn.commit()
+
+    @staticmethod
+    def _upload_local_images(groups: list) -> list:
+        """
+        Uploads the local images (see image_question_generation.store_image_locally) that
+        quiz_questions documents point at and rewrites their image_url to the public URL.
+        Questions whose image fails to upload are left out, so they stay unsynced.
+        """
+        from image_question_generation import upload_image_to_gcs
+
+        uploaded, ready = {}, []
+        for writes in groups:
+            ok = True
+            for collection, _, data in writes:
+                image_url = data.get("image_url") if collection == "quiz_questions" else None
+                if not image_url or os.path.dirname(os.path.abspath(image_url)) != os.path.abspath(LOCAL_IMAGE_DIR):
+                    continue
+                if image_url not in uploaded:
+                    uploaded[image_url] = upload_image_to_gcs(image_url) if os.path.exists(image_url) else None
+                data["image_url"] = uploaded[image_url]
+                ok = ok and uploaded[image_url] is not None
+            if ok:
+                ready.append(writes)
+            else:
+                print(f"WARNING: Could not upload the image of question {writes[0][1]}; it stays unsynced.")
+        return ready
+
+    def sync(self, target=None) -> int:
+        """
+        Pushes every unsynced question to Firestore (or another backend with the same
+        write(groups, on_commit) signature) in batched writes, marking documents synced
+        batch by batch so an interrupted sync resumes where it stopped. Figures stored in
+        LOCAL_IMAGE_DIR are uploaded to GCS first and referenced by their public URL.
+        Returns the number of documents written.
+        """
+        if target is None:
+            from database.firebase import FirestoreBackend
+            target = FirestoreBackend()
+        groups = self._upload_local_images(self.unsynced_groups())
+        target.write(groups, on_commit=lambda committed: self.mark_synced([w for writes in committed for w in writes]))
+        written = sum(len(writes) for writes in groups)
+        print(f"INFO: Synced {len(groups)} questions ({written} documents) from {self.path} to {target.name}.")
+        return written
+
+    def stats(self) -> dict:
+        """Document and unsynced counts per top-level collection ("SAT/<section>" for index entries)."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT collection, COUNT(*), SUM(synced_at IS NULL) FROM documents GROUP BY collection"
+            ).fetchall()
+        stats = {}
+        for collection, total, unsynced in rows:
+            key = "/".join(collection.split("/")[:2])
+            entry = stats.setdefault(key, {"documents": 0, "unsynced": 0})
+            entry["documents"] += total
+            entry["unsynced"] += unsynced
+        return stats
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local SQLite question bank.")
+    parser.add_argument("--path", default=LOCAL_BANK_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("sync", help="Upload unsynced questions to Firestore in batches.")
+    commands.add_parser("stats", help="Show document counts per collection.")
+    args = parser.parse_args()
+
+    bank = SQLiteBackend(args.path)
+    if args.command == "sync":
+        bank.sync()
+    else:
+        for collection, entry in sorted(bank.stats().items()):
+            print(f"{collection:<20} {entry['documents']:>8} documents  {entry['unsynced']:>8} unsynced")
@@ -0,0 +1,130 @@
+import json
+import os
+import random
+import sys
+from datetime import datetime
+
+from config.settings import BANK_SNAPSHOT_PATH
+
+
+def _to_local(data: dict) -> dict:
+    """Firestore document -> JSON-safe dict (timestamps become ISO strings)."""
+    data = dict(data)
+    if isinstance(data.get("updated_at"), datetime):
+        data["updated_at"] = data["updated_at"].isoformat()
+    return data
+
+
+class BankSnapshot:
+    """
+    Local copy of the quiz_questions collection with in-memory indexes by section,
+    difficulty and tag, so quizzes can be assembled without any Firestore reads.
+
+    The snapshot is a JSONL file (one question per line) plus a small .meta.json
+    holding the newest updated_at seen, which refresh() uses to fetch only the
+    documents written since the last sync.
+    """
+
+    def __init__(self, path: str = BANK_SNAPSHOT_PATH):
+        self.path = path
+        self.meta_path = path + ".meta.json"
+        self.questions = {}
+        self.last_updated_at = None
+        self._by_key = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        q = json.loads(line)
+                        self.questions[q["question_id"]] = q
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                self.last_updated_at = json.load(f).get("last_updated_at")
+        self._build_indexes()
+
+    def __len__(self):
+        return len(self.questions)
+
+    def _build_indexes(self):
+        """
+        Maps (section, difficulty, tag) and its wildcard forms (None for "any") to
+        tuples of question IDs, so every blueprint lookup is a single dict access.
+        """
+        by_key = {}
+        for question_id, q in self.questions.items():
+            section, difficulty = q.get("section"), q.get("difficulty")
+            for tag in set(q.get("tags") or []) | {None}:
+                for key in ((section, difficulty, tag), (section, None, tag), (None, difficulty, tag), (None, None, tag)):
+                    by_key.setdefault(key, []).append(question_id)
+        self._by_key = {key: tuple(ids) for key, ids in by_key.items()}
+
+    def refresh(self, full: bool = False) -> int:
+        """
+        Pulls new and changed quiz_questions documents from the storage backend
+        (Firestore or the local bank) and saves the snapshot. The first sync (or
+        full=True) exports the whole collection; later syncs only read documents
+        whose updated_at is newer than the last one seen.
+        Returns the number of documents fetched.
+        """
+        from database.storage import get_backend
+
+        since = None if full else self.last_updated_at
+        fetched = 0
+        for doc in get_backend().iter_quiz_questions(since):
+            q = _to_local(doc)
+            self.questions[q["question_id"]] = q
+            if q.get("updated_at") and (self.last_updated_at is None or q["updated_at"] > self.last_updated_at):
+                self.last_updated_at = q["updated_at"]
+            fetched += 1
+
+        self._build_indexes()
+        self.save()
+        print(f"INFO: Snapshot refreshed with {fetched} documents; {len(self.questions)} questions stored locally.")
+        return fetched
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temp file and swap it in, so an interrupted save never corrupts the snapshot
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for q in self.questions.values():
+                f.write(json.dumps(q, ensure_ascii=False, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.path)
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump({"last_updated_at": self.last_updated_at}, f)
+
+    def question_ids(self, section: str = None, difficulty: str = None, tag: str = None) -> tuple:
+        """IDs of all questions matching the given filters (None matches anything)."""
+        return self._by_key.get((section, difficulty, tag), ())
+
+    def count(self, section: str = None, difficulty: str = None, tag: str = None) -> int:
+        return len(self.question_ids(section, difficulty, tag))
+
+    def sample_quiz(self, blueprint: list, seed=None) -> list:
+        """
+        Assembles a quiz from a blueprint: a list of dicts with "count" and any of
+        "section", "difficulty" and "tag", e.g.
+            [{"section": "math", "difficulty": "hard", "tag": "Quadratic Equations and Functions", "count": 5}]
+        No question is used twice. Raises ValueError if a blueprint item can't be filled.
+        """
+        rng = random.Random(seed)
+        chosen, picked = [], set()
+        for item in blueprint:
+            pool = self.question_ids(item.get("section"), item.get("difficulty"), item.get("tag"))
+            count = item["count"]
+            # Oversample by the number already picked so overlap with earlier items can be discarded
+            sample = rng.sample(pool, min(len(pool), count + len(picked)))
+            fresh = [question_id for question_id in sample if question_id not in picked][:count]
+            if len(fresh) < count:
+                raise ValueError(f"Only {len(fresh)} questions available for blueprint item {item}")
+            picked.update(fresh)
+            chosen.extend(self.questions[question_id] for question_id in fresh)
+        return chosen
+
+
+if __name__ == "__main__":
+    # python -m database.snapshot [--full]   -> refresh the local bank snapshot
+    snapshot = BankSnapshot()
+    snapshot.refresh(full="--full" in sys.argv)
@@ -0,0 +1,139 @@
+import abc
+import threading
+import uuid
+
+from config.settings import STORAGE_BACKEND
+from pipeline.metrics import metrics
+
+
+def _safe_tag(tag: str) -> str:
+    return tag.replace("/", "_").replace(" ", "-")
+
+def question_writes(question_data) -> tuple:
+    """
+    Returns (question_id, writes) for a Question or question dict, where writes is a
+    list of (collection_path, document_id, data) for its SAT index entries and its
+    quiz_questions document. Questions keep their own ID; dicts are assigned one.
+    Every backend stores exactly these documents, so a local bank syncs 1:1.
+    """
+    if hasattr(question_data, "to_dict"):
+        question_data = question_data.to_dict()
+        question_id = question_data["question_id"]
+    else:
+        question_id = str(uuid.uuid4())
+    section = question_data["section"]
+    difficulty = question_data["difficulty"]
+    tags = list(question_data.get("tags") or ["untagged"])
+
+    index_data = {"question_id": question_id}
+    writes = [
+        (f"SAT/{section}/{difficulty}/{_safe_tag(tag)}/questions", question_id, index_data)
+        for tag in tags
+    ]
+
+    final_question_data = {
+        "question_id": question_id,
+        "question_text": question_data["question_text"],
+        "options": question_data["options"],
+        "correct": question_data["correct"],
+        "difficulty": difficulty,
+        "section": section,
+        "tags": tags,
+        "image_url": question_data.get("image_url", None), # Safely get image_url
+    }
+    if question_data.get("duplicate_of"):
+        # Flagged (not rejected) by the near-duplicate check; kept for review
+        final_question_data["duplicate_of"] = question_data["duplicate_of"]
+    writes.append(("quiz_questions", question_id, final_question_data))
+    return question_id, writes
+
+
+class StorageBackend(abc.ABC):
+    """
+    Where generated questions are written. A backend implements write() for groups of
+    documents (each group lands atomically) and iter_quiz_questions() for snapshot
+    refreshes; the question layout itself comes from question_writes(). Backends stamp
+    quiz_questions documents with their own updated_at.
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    def write(self, groups: list):
+        """Writes `groups`, each a list of (collection_path, document_id, data)."""
+
+    @abc.abstractmethod
+    def iter_quiz_questions(self, since: str = None):
+        """Yields quiz_questions documents as dicts, only those updated after `since` (ISO time) if given."""
+
+    def upload_questions(self, questions: list) -> list:
+        question_ids, groups = [], []
+        for question_data in questions:
+            question_id, writes = question_writes(question_data)
+            question_ids.append(question_id)
+            groups.append(writes)
+        self.write(groups)
+        return question_ids
+
+    def create_quiz_entry(self, question_id: str, question_data: dict):
+        self.write([[("quiz_questions", question_id, question_data)]])
+
+
+def create_backend(name: str, **kwargs) -> StorageBackend:
+    """Backends are imported on demand, so the local one never loads the Google client libraries."""
+    if name == "firestore":
+        from database.firebase import FirestoreBackend
+        return FirestoreBackend(**kwargs)
+    if name == "sqlite":
+        from database.local import SQLiteBackend
+        return SQLiteBackend(**kwargs)
+    raise ValueError(f"Unknown storage backend {name!r} (expected 'firestore' or 'sqlite')")
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend() -> StorageBackend:
+    """Returns the process-wide backend selected by STORAGE_BACKEND, creating it on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend(STORAGE_BACKEND)
+    return _backend
+
+def use_backend(backend, **kwargs) -> StorageBackend:
+    """Switches the process-wide backend to a backend instance or name (e.g. "sqlite", path=...)."""
+    global _backend
+    with _backend_lock:
+        _backend = create_backend(backend, **kwargs) if isinstance(backend, str) else backend
+    return _backend
+
+def upload_questions(questions: list) -> list:
+    """
+    Uploads many questions in bulk: every question is indexed under each of its tags in
+    the SAT collection and saved once to quiz_questions. A question's writes never
+    straddle two batches, so each question lands atomically.
+    Returns the assigned question IDs in input order.
+    """
+    backend = get_backend()
+    with metrics.timer(f"{backend.name}.upload_questions"):
+        question_ids = backend.upload_questions(questions)
+    metrics.count("questions.uploaded", len(question_ids))
+
+    print(f"Uploaded {len(question_ids)} questions to SAT index and quiz_questions collections ({backend.name}).")
+    return question_ids
+
+def upload_question(question_data: dict) -> str:
+    """
+    Uploads a question ID to the SAT index collection and the full data
+    to the quiz_questions collection.
+    """
+    return upload_questions([question_data])[0]
+
+def create_quiz_entry(question_id: str, question_data: dict):
+    """
+    Saves the complete question data to the main quiz_questions collection.
+    """
+    backend = get_backend()
+    with metrics.timer(f"{backend.name}.create_quiz_entry"):
+        backend.create_quiz_entry(question_id, question_data)
+    print(f"Saved full data for {question_id} in quiz_questions collection.")
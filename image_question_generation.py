@@ -1,23 +1,70 @@
+import base64
+import hashlib
+import json
+import mimetypes
 import os
-from google.cloud import storage
-from pipeline.pipeline import generate_mcqs
-from database.firebase import upload_question
-from config.settings import SECTIONS, DIFFICULTIES
+import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pipeline.engine import run_ordered
+from pipeline.pipeline import generate_mcqs_multi
+from pipeline.dedup import DuplicateIndex
+from database.storage import get_backend, upload_questions
+from pipeline.metrics import metrics
+from config.settings import SECTIONS, DIFFICULTIES, MAX_CONCURRENCY, DEDUP_INDEX_PATH, DEDUP_THRESHOLD, METRICS_PATH, LOCAL_IMAGE_DIR
 
 # --- CONFIGURE YOUR GOOGLE CLOUD STORAGE ---
 # Make sure this is your correct GCS bucket name
 GCS_BUCKET_NAME = "pratinidhi-ai-project.appspot.com" 
 # -----------------------------------------
 
-def upload_image_to_gcs(file_path: str, destination_blob_name: str) -> str:
-    """Uploads a file to the GCS bucket and returns its public URL."""
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+
+_storage_client = None
+_storage_client_lock = threading.Lock()
+
+def get_bucket():
+    """
+    Returns the GCS bucket through one storage client shared by all threads. The client
+    library is imported here, so runs against the local bank don't need it installed.
+    """
+    global _storage_client
+    with _storage_client_lock:
+        if _storage_client is None:
+            from google.cloud import storage
+            _storage_client = storage.Client()
+    return _storage_client.bucket(GCS_BUCKET_NAME)
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def upload_image_to_gcs(file_path: str, destination_blob_name: str = None) -> str:
+    """
+    Uploads a file to the GCS bucket and returns its public URL. Blobs are named by
+    the SHA-256 of their bytes unless a name is given, and the upload is skipped when
+    a blob with the same content hash already exists.
+    """
     try:
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(GCS_BUCKET_NAME)
-        blob = bucket.blob(destination_blob_name)
+        sha256 = file_sha256(file_path)
+        if destination_blob_name is None:
+            destination_blob_name = f"images/{sha256}{os.path.splitext(file_path)[1].lower()}"
+        blob = get_bucket().get_blob(destination_blob_name)
+        if blob is not None and (blob.metadata or {}).get("sha256") == sha256:
+            print(f"INFO: {file_path} already at gs://{GCS_BUCKET_NAME}/{destination_blob_name}, skipping upload")
+            metrics.count("gcs.skipped_uploads")
+            return blob.public_url
 
-        blob.upload_from_filename(file_path)
-        blob.make_public()
+        blob = get_bucket().blob(destination_blob_name)
+        blob.metadata = {"sha256": sha256}
+        with metrics.timer("gcs.upload"):
+            blob.upload_from_filename(file_path)
+            blob.make_public()
+        metrics.count("gcs.uploads")
         
         print(f"INFO: Uploaded {file_path} to gs://{GCS_BUCKET_NAME}/{destination_blob_name}")
         return blob.public_url
@@ -25,6 +72,135 @@ def upload_image_to_gcs(file_path: str, destination_blob_name: str) -> str:
         print(f"ERROR: Could not upload {file_path}. Is your bucket name correct? Error: {e}")
         return None
 
+def store_image_locally(file_path: str) -> str:
+    """
+    Copies an image into LOCAL_IMAGE_DIR, named by the SHA-256 of its bytes like the GCS
+    blobs, and returns the local path. `python -m database.local sync` uploads it later.
+    """
+    sha256 = file_sha256(file_path)
+    os.makedirs(LOCAL_IMAGE_DIR, exist_ok=True)
+    local_path = os.path.join(LOCAL_IMAGE_DIR, f"{sha256}{os.path.splitext(file_path)[1].lower()}")
+    if not os.path.exists(local_path):
+        shutil.copyfile(file_path, local_path)
+    metrics.count("images.stored_locally")
+    return local_path
+
+def upload_image(file_path: str, destination_blob_name: str = None) -> str:
+    """Stores an image where the configured backend's questions can reference it: GCS, or LOCAL_IMAGE_DIR for the local bank."""
+    if get_backend().name == "sqlite":
+        return store_image_locally(file_path)
+    return upload_image_to_gcs(file_path, destination_blob_name)
+
+def vision_url(image_url: str) -> str:
+    """A URL the vision API can read: public URLs as they are, local images inlined as a base64 data URL."""
+    if image_url is None or image_url.startswith(("http://", "https://", "data:")):
+        return image_url
+    mime_type = mimetypes.guess_type(image_url)[0] or "image/png"
+    with open(image_url, "rb") as f:
+        return f"data:{mime_type};base64,{base64.b64encode(f.read()).decode('ascii')}"
+
+def upload_images_concurrently(file_paths: list, max_workers: int = MAX_CONCURRENCY) -> list:
+    """Uploads many images over the shared client; returns their URLs (None on failure) in order."""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(upload_image, file_paths))
+
+def load_image_list(source: str) -> list:
+    """
+    Resolves a batch source to a list of image entries {"path": ..., "context": ...}.
+    `source` is a directory of images, a JSON manifest (a list of paths or of such
+    entries), or a text manifest with one path per line.
+    """
+    if os.path.isdir(source):
+        return [
+            {"path": os.path.join(source, name)}
+            for name in sorted(os.listdir(source))
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+    with open(source, encoding="utf-8") as f:
+        if source.lower().endswith(".json"):
+            entries = json.load(f)
+        else:
+            entries = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return [entry if isinstance(entry, dict) else {"path": entry} for entry in entries]
+
+def generate_questions_for_images(source, num_versions_per_category: int, split_sections: bool = True, max_workers: int = MAX_CONCURRENCY, manifest=None):
+    """
+    Batch mode: uploads every image from a directory or manifest concurrently (skipping
+    ones already in the bucket), then generates questions for all images in parallel and
+    uploads them as each generation finishes. With split_sections each image gets one
+    call per section (all difficulties at once) so the calls run side by side; otherwise
+    one call covers every section x difficulty.
+    `source` may also be a list of image entries as returned by load_image_list.
+    With a RunManifest, units are (image sha256, section, difficulty): images whose units
+    are all done are neither uploaded nor sent again, and a unit is marked done once
+    generation produced questions for it.
+    """
+    entries = load_image_list(source) if isinstance(source, str) else list(source)
+    entries = [entry for entry in entries if os.path.exists(entry["path"])]
+    section_groups = [[section] for section in SECTIONS] if split_sections else [SECTIONS]
+
+    def pending(entry, sections):
+        """The sections and difficulties of a job that aren't done yet."""
+        if manifest is None:
+            return sections, DIFFICULTIES
+        if "sha256" not in entry:  # extract_figures already supplies it; hash other images once
+            entry["sha256"] = file_sha256(entry["path"])
+        sha256 = entry["sha256"]
+        sections = [s for s in sections if any(not manifest.is_done(sha256, s, d) for d in DIFFICULTIES)]
+        difficulties = [d for d in DIFFICULTIES if any(not manifest.is_done(sha256, s, d) for s in sections)]
+        return sections, difficulties
+
+    if manifest is not None:
+        before = len(entries)
+        entries = [entry for entry in entries if any(pending(entry, sections)[0] for sections in section_groups)]
+        if before > len(entries):
+            print(f"INFO: Skipping {before - len(entries)} images already done in {manifest.path}")
+
+    print(f"--- Uploading {len(entries)} images ---")
+    urls = upload_images_concurrently([entry["path"] for entry in entries], max_workers=max_workers)
+
+    generic_context = "Generate a question based on the provided image and the SAT syllabus."
+    jobs, job_entries = [], []
+    for entry, url in zip(entries, urls):
+        if not url:
+            continue
+        for sections in section_groups:
+            sections, difficulties = pending(entry, sections)
+            if not sections:
+                continue
+            jobs.append({
+                "chunk": entry.get("context") or generic_context,
+                "sections": sections,
+                "difficulties": difficulties,
+                "num_questions": num_versions_per_category,
+                "image_url": vision_url(url),
+            })
+            job_entries.append((entry, url))
+
+    dedup_index = DuplicateIndex.load_or_create(DEDUP_INDEX_PATH)
+    def upload_job(job_index, questions):
+        entry, url = job_entries[job_index]
+        for q in questions:
+            q.image_url = url  # the stored URL, not the data URL a local image was sent as
+        # Units the reply had no usable questions for stay pending for the next run
+        produced = {(q.section, q.difficulty) for q in questions}
+        questions = dedup_index.filter_new(questions, DEDUP_THRESHOLD)
+        question_ids = upload_questions(questions) if questions else []
+        dedup_index.add_many(question_ids, questions)
+        if manifest is None:
+            return
+        sha256 = entry["sha256"]
+        for section, difficulty in sorted(produced):
+            ids = [qid for q, qid in zip(questions, question_ids) if (q.section, q.difficulty) == (section, difficulty)]
+            manifest.mark_done(sha256, section, difficulty, ids)
+
+    print(f"--- Generating questions for {len(jobs)} image/section jobs ({max_workers} concurrent) ---")
+    try:
+        results = run_ordered(generate_mcqs_multi, jobs, max_workers=max_workers, default=[], on_result=upload_job)
+    finally:
+        dedup_index.save(DEDUP_INDEX_PATH)
+    print(f"\n--- Batch Completed: {sum(len(q) for q in results)} questions from {len(urls) - urls.count(None)} images ---")
+
 def generate_questions_for_single_image(local_image_path: str, num_versions_per_category: int):
     """
     Generates multiple question versions for a single local image.
@@ -38,8 +214,8 @@ def generate_questions_for_single_image(local_image_path: str, num_versions_per_
     # Use the image's own filename as its name in the cloud
     image_filename = os.path.basename(local_image_path)
     
-    # 1. Upload the single image to GCS to get its URL
-    public_url = upload_image_to_gcs(local_image_path, image_filename)
+    # 1. Upload the single image to GCS (or the local bank's image directory) to get its URL
+    public_url = upload_image(local_image_path, image_filename)
     if not public_url:
         print("ERROR: Halting process due to image upload failure.")
         return
@@ -50,31 +226,32 @@ def generate_questions_for_single_image(local_image_path: str, num_versions_per_
     # We provide a generic text context for the AI
     generic_context = "Generate a question based on the provided image and the SAT syllabus."
     
-    for section in SECTIONS:
-        for difficulty in DIFFICULTIES:
-            print(f"  -> Generating: {section}, {difficulty}")
-            
-            # Call the generator to create the desired number of questions
-            questions = generate_mcqs(
-                chunk=generic_context,
-                difficulty=difficulty,
-                section=section,
-                num_questions=num_versions_per_category, # Use the parameter here
-                image_url=public_url
-            )
-            
-            # 3. Upload the newly generated questions to Firestore
-            for q_data in questions:
-                upload_question(q_data)
+    # All section x difficulty combinations are requested in one call, so the image,
+    # syllabus and instructions are sent once instead of nine times
+    print(f"  -> Generating: {', '.join(SECTIONS)} x {', '.join(DIFFICULTIES)}")
+    questions = generate_mcqs_multi(
+        chunk=generic_context,
+        sections=SECTIONS,
+        difficulties=DIFFICULTIES,
+        num_questions=num_versions_per_category, # Use the parameter here
+        image_url=vision_url(public_url)
+    )
+    for question in questions:
+        question.image_url = public_url
+
+    # 3. Upload the newly generated questions to Firestore
+    upload_questions(questions)
 
     print("\n--- Pipeline Completed ---")
 
 if __name__ == "__main__":
     # --- YOUR INPUT GOES HERE ---
     
-    # 1. Tell the script where to find your local image file.
+    # 1. Tell the script where to find your images: a single image file, a directory
+    #    of images, or a manifest (.json / .txt) listing image paths. Can also be
+    #    passed on the command line: python image_question_generation.py extracted_images
     #    (e.g., "C:\\Users\\Ananya\\Downloads\\my_graph_image.png")
-    image_to_process = "images_to_process/my_graph_image.png" 
+    image_source = sys.argv[1] if len(sys.argv) > 1 else "images_to_process/my_graph_image.png"
     
     # 2. Tell the script how many questions you want for EACH category.
     #    (e.g., 3 easy math, 3 medium math, 3 hard math, 3 easy reading, etc.)
@@ -82,4 +259,10 @@ if __name__ == "__main__":
     
     # --------------------------
     
-    generate_questions_for_single_image(image_to_process, number_of_questions_to_create)
\ No newline at end of file
+    try:
+        if os.path.isfile(image_source) and image_source.lower().endswith(IMAGE_EXTENSIONS):
+            generate_questions_for_single_image(image_source, number_of_questions_to_create)
+        else:
+            generate_questions_for_images(image_source, number_of_questions_to_create)
+    finally:
+        metrics.export_json(METRICS_PATH)
\ No newline at end of file
@@ -1,46 +1,115 @@
-import fitz  
-from pipeline.pipeline import generate_mcqs
-from database.firebase import upload_question, create_quiz_entry
-from config.settings import SECTIONS, DIFFICULTIES
-
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extracts all text from a given PDF file."""
-    doc = fitz.open(pdf_path)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    doc.close()
-    return text
-
-def chunk_text(text: str, chunk_size: int = 2000) -> list[str]:
-    """Splits text into smaller chunks of a specified size."""
-    return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+import os
+from pipeline.engine import run_ordered
+from pipeline.pipeline import generate_mcqs_multi
+from pipeline.checkpoint import chunk_key, manifest_for
+from pipeline.ingest import chunk_pdf, iter_directory_chunks, list_pdfs
+from pipeline.streaming import run_streaming
+from pipeline.dedup import DuplicateIndex
+from pipeline.selection import select_chunks
+from pipeline.figures import extract_figures
+from image_question_generation import generate_questions_for_images
+from pipeline.metrics import metrics
+from database.storage import upload_questions
+from config.settings import SECTIONS, DIFFICULTIES, MAX_CONCURRENCY, DEDUP_INDEX_PATH, DEDUP_THRESHOLD, METRICS_PATH
 
-if __name__ == "__main__":
-    # 1. Extract text from your resource file
-    # Make sure you have a 'resources/books' directory with 'book1.pdf' inside
-    print("Extracting text from PDF...")
-    text = extract_text_from_pdf("resources/Notes/A.pdf")
+def generate_and_upload(source: str, chunks: list, section: str, num_questions: int, dedup_index: DuplicateIndex = None):
+    """
+    Generates questions for every (chunk, difficulty) unit of one source and uploads them,
+    skipping units a previous, interrupted run already uploaded. Under a chunk budget,
+    boilerplate chunks are dropped and only a diverse subset covering the section's tags
+    is used. All remaining difficulties of a chunk are requested in a single call.
+    Near-duplicates of questions already in `dedup_index` (or earlier in the same chunk)
+    are rejected before upload.
+    """
+    manifest = manifest_for(source, section)
+    keys = [chunk_key(chunk) for chunk in chunks]
+    # Chunks started by an earlier run stay selected so their remaining difficulties get finished
+    started = [i for i, key in enumerate(keys) if any(manifest.is_done(source, key, d) for d in DIFFICULTIES)]
+    jobs, job_keys = [], []
+    for i in select_chunks(chunks, section, done=started):
+        remaining = [d for d in DIFFICULTIES if not manifest.is_done(source, keys[i], d)]
+        if remaining:
+            jobs.append({"chunk": chunks[i], "sections": [section], "difficulties": remaining, "num_questions": num_questions})
+            job_keys.append(keys[i])
+    if len(manifest):
+        print(f"Resuming {source}: {len(manifest)} units already uploaded, {len(jobs)} chunks remaining.")
+
+    # Generate concurrently; upload and checkpoint each chunk as soon as it finishes
+    def upload_unit(job_index, questions):
+        # Difficulties the reply had no usable questions for stay pending for the next run
+        produced = {q.difficulty for q in questions}
+        if dedup_index is not None:
+            questions = dedup_index.filter_new(questions, DEDUP_THRESHOLD)
+        # Each question is written exactly once: SAT index entries plus its quiz_questions document
+        question_ids = upload_questions(questions) if questions else []
+        if dedup_index is not None:
+            dedup_index.add_many(question_ids, questions)
+        ids_by_difficulty = {}
+        for q_data, question_id in zip(questions, question_ids):
+            ids_by_difficulty.setdefault(q_data.difficulty, []).append(question_id)
+        for difficulty in jobs[job_index]["difficulties"]:
+            if difficulty in produced:
+                manifest.mark_done(source, job_keys[job_index], difficulty, ids_by_difficulty.get(difficulty, []))
+
+    print(f"--- Generating questions for section: {section} ({len(jobs)} jobs, {MAX_CONCURRENCY} concurrent) ---")
+    results = run_ordered(generate_mcqs_multi, jobs, max_workers=MAX_CONCURRENCY, default=[], on_result=upload_unit)
+    print(f"Generated and uploaded {sum(len(q) for q in results)} questions from {len(chunks)} chunks of {source}.")
+
+def run(source_path: str, section: str, num_questions: int = 1, include_figures: bool = True,
+        questions_per_figure: int = 1, use_streaming_pipeline: bool = True, figures_dir: str = "extracted_images"):
+    """Runs the whole PDF -> questions -> upload flow for a PDF or a directory of PDFs."""
+    if use_streaming_pipeline:
+        # 3+4. Extract, chunk, generate, tag, validate and upload concurrently through bounded queues
+        processed = list_pdfs(source_path)
+        run_streaming(processed, section, num_questions)
+    else:
+        # 3. Stream pages and chunk on sentence boundaries (directories are extracted in parallel)
+        print("Extracting text from PDF...")
+        if os.path.isdir(source_path):
+            sources = iter_directory_chunks(source_path)
+        else:
+            with metrics.timer("stage.extract+chunk"):
+                sources = [(source_path, chunk_pdf(source_path))]
 
-    # 2. Chunk the text
-    chunks = chunk_text(text)
-    print(f"Split text into {len(chunks)} chunks.")
+        # 4. Generate questions for each source and upload, skipping near-duplicates of the existing bank
+        dedup_index = DuplicateIndex.load_or_create(DEDUP_INDEX_PATH)
+        processed = []
+        try:
+            for pdf_path, chunks in sources:
+                print(f"Split {pdf_path} into {len(chunks)} chunks.")
+                with metrics.timer("stage.generate+upload"):
+                    generate_and_upload(pdf_path, chunks, section, num_questions, dedup_index)
+                processed.append(pdf_path)
+        finally:
+            dedup_index.save(DEDUP_INDEX_PATH)
+
+    # 5. Extract each PDF's figures (with their nearby text) and run them through the image pipeline
+    if include_figures:
+        for pdf_path in processed:
+            output_dir = os.path.join(figures_dir, os.path.splitext(os.path.basename(pdf_path))[0])
+            with metrics.timer("stage.extract_figures"):
+                figures = extract_figures(pdf_path, output_dir)
+            if figures:
+                # Figure units are checkpointed per PDF, so a rerun only generates for new or unfinished figures
+                with metrics.timer("stage.image_questions"):
+                    generate_questions_for_images(figures, questions_per_figure, manifest=manifest_for(pdf_path, "figures"))
+
+if __name__ == "__main__":
+    # 1. Point this at a single PDF or at a directory of PDFs
+    # Make sure you have a 'resources/Notes' directory with your PDFs inside
+    source_path = "resources/Notes/A.pdf"
 
-    # 3. Pick section for this run
+    # 2. Pick section for this run
     section = "math"  # You can change this to "reading" or "writing"
     num_questions = 1 # Number of questions to generate per chunk
+    include_figures = True # Also extract the PDFs' figures and generate image questions from them
+    questions_per_figure = 1 # Per section and difficulty, for each extracted figure
+    use_streaming_pipeline = True # Overlap extraction, generation, tagging and upload instead of running them back to back
 
-    # 4. Generate questions for each difficulty and upload
-    for difficulty in DIFFICULTIES:
-        print(f"--- Generating {difficulty} questions for section: {section} ---")
-        for i, chunk in enumerate(chunks):
-            print(f"Processing chunk {i+1}/{len(chunks)}...")
-            questions = generate_mcqs(chunk, difficulty, section, num_questions=num_questions)
-            for q_data in questions:
-                # Firestore has trouble with the Question class object, so we pass the dictionary directly
-                question_id = upload_question(q_data) # This saves to the main SAT path
-                if question_id:
-                    create_quiz_entry(question_id, q_data) # This creates the separate quiz entry
-            print(f"Generated and uploaded {len(questions)} questions for chunk {i+1}.")
+    try:
+        run(source_path, section, num_questions, include_figures, questions_per_figure, use_streaming_pipeline)
+    finally:
+        # Per-stage latencies, token usage, estimated cost and Firestore op counts for this run
+        metrics.export_json(METRICS_PATH)
 
     print("\nPipeline completed successfully!")
\ No newline at end of file
@@ -0,0 +1,224 @@
+"""
+Offline generation through the OpenAI Batch API.
+
+    # 1. Stage every chunk x difficulty prompt in a JSONL request file
+    python -m pipeline.batch prepare resources/Notes --section math --out batch/math.jsonl
+
+    # 2. Submit batch/math.jsonl to the Batch API and download the results file, then:
+    python -m pipeline.batch ingest batch/math.jsonl batch/math_results.jsonl
+
+Ingest works entirely from local files. Failed or missing requests are written to
+`<requests>.retry.jsonl` so they can be re-queued as a new batch.
+"""
+import argparse
+import json
+import os
+
+from config.settings import DIFFICULTIES
+from pipeline.metrics import metrics
+from pipeline.pipeline import generation_request_body, parse_generated_questions, fill_missing_tags
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+
+def _meta_path(requests_path: str) -> str:
+    """Sidecar holding the job parameters needed to interpret each request's result."""
+    return requests_path + ".meta"
+
+
+def write_batch_requests(jobs: list, requests_path: str) -> int:
+    """
+    Writes one Batch API request line per job to `requests_path`, plus a metadata
+    sidecar. Each job is a dict with chunk, sections, difficulties and optionally
+    num_questions, image_url, inline_tags, source and chunk_index. Returns the
+    number of requests written.
+    """
+    directory = os.path.dirname(requests_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(requests_path, "w", encoding="utf-8") as requests_file, \
+            open(_meta_path(requests_path), "w", encoding="utf-8") as meta_file:
+        for n, job in enumerate(jobs):
+            custom_id = job.get("custom_id") or f"req-{n}"
+            meta = {
+                "custom_id": custom_id,
+                "source": job.get("source"),
+                "chunk_index": job.get("chunk_index"),
+                "chunk": job["chunk"],
+                "sections": job["sections"],
+                "difficulties": job["difficulties"],
+                "num_questions": job.get("num_questions", 1),
+                "image_url": job.get("image_url"),
+                "inline_tags": job.get("inline_tags", True),
+            }
+            body = generation_request_body(
+                meta["chunk"], meta["sections"], meta["difficulties"],
+                meta["num_questions"], meta["image_url"], meta["inline_tags"]
+            )
+            requests_file.write(json.dumps({"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}) + "\n")
+            meta_file.write(json.dumps(meta) + "\n")
+
+    print(f"INFO: Wrote {len(jobs)} batch requests to {requests_path}")
+    return len(jobs)
+
+
+def _read_jsonl(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def ingest_batch_results(requests_path: str, results_path: str, tag_missing: bool = True) -> tuple:
+    """
+    Parses a Batch API results file against the requests it answers.
+    Returns (questions_by_id, failed_ids): the parsed question dicts per custom_id,
+    and the custom_ids that errored, returned unparseable output or no usable questions,
+    or have no result.
+    With tag_missing, questions whose inline tags couldn't be repaired are tagged
+    with a batched LLM call; pass False to stay fully offline.
+    """
+    metas = {meta["custom_id"]: meta for meta in _read_jsonl(_meta_path(requests_path))}
+    questions_by_id, failed_ids = {}, []
+
+    for line in _read_jsonl(results_path):
+        custom_id = line.get("custom_id")
+        meta = metas.get(custom_id)
+        if meta is None:
+            print(f"WARNING: Result for unknown request {custom_id}, ignoring.")
+            continue
+        response = line.get("response") or {}
+        if line.get("error") or response.get("status_code") != 200:
+            print(f"ERROR: Batch request {custom_id} failed: {line.get('error') or response.get('status_code')}")
+            failed_ids.append(custom_id)
+            continue
+        metrics.record_usage(f"batch:{response['body'].get('model', 'gpt-4o')}", response["body"].get("usage"))
+        try:
+            content = response["body"]["choices"][0]["message"]["content"]
+            questions = parse_generated_questions(content, meta["sections"], meta["difficulties"], meta["image_url"], meta["inline_tags"])
+        except Exception as e:
+            print(f"ERROR: Could not parse result for {custom_id}: {e}")
+            failed_ids.append(custom_id)
+            continue
+        if not questions:
+            print(f"ERROR: Result for {custom_id} contained no usable questions.")
+            failed_ids.append(custom_id)
+            continue
+        if tag_missing:
+            fill_missing_tags(questions)
+        questions_by_id[custom_id] = questions
+
+    missing = [custom_id for custom_id in metas if custom_id not in questions_by_id and custom_id not in failed_ids]
+    if missing:
+        print(f"WARNING: {len(missing)} requests have no result line.")
+    return questions_by_id, failed_ids + missing
+
+
+def write_retry_requests(requests_path: str, failed_ids: list, retry_path: str = None) -> str:
+    """Copies the failed requests (and their metadata) into a new request file for re-queuing."""
+    retry_path = retry_path or os.path.splitext(requests_path)[0] + ".retry.jsonl"
+    failed = set(failed_ids)
+    metas = [meta for meta in _read_jsonl(_meta_path(requests_path)) if meta["custom_id"] in failed]
+    write_batch_requests(metas, retry_path)
+    return retry_path
+
+
+def _prepare(args):
+    from pipeline.ingest import chunk_pdf, iter_directory_chunks
+    from pipeline.selection import select_chunks
+
+    if os.path.isdir(args.source):
+        sources = iter_directory_chunks(args.source)
+    else:
+        sources = [(args.source, chunk_pdf(args.source))]
+
+    jobs = []
+    for pdf_path, chunks in sources:
+        # Same boilerplate filtering and chunk budget as interactive runs
+        for i in select_chunks(chunks, args.section):
+            chunk = chunks[i]
+            # One request per chunk covers every difficulty, unless split per difficulty
+            groups = [[d] for d in DIFFICULTIES] if args.per_difficulty else [DIFFICULTIES]
+            for difficulties in groups:
+                jobs.append({
+                    "source": pdf_path, "chunk_index": i, "chunk": chunk,
+                    "sections": [args.section], "difficulties": difficulties,
+                    "num_questions": args.num_questions,
+                })
+    write_batch_requests(jobs, args.out)
+
+
+def _ingest(args):
+    questions_by_id, failed_ids = ingest_batch_results(args.requests, args.results, tag_missing=not args.offline)
+    total = sum(len(questions) for questions in questions_by_id.values())
+    print(f"INFO: Parsed {total} questions from {len(questions_by_id)} requests; {len(failed_ids)} failed.")
+
+    if failed_ids:
+        retry_path = write_retry_requests(args.requests, failed_ids)
+        print(f"INFO: Re-queue failed requests from {retry_path}")
+
+    if args.dry_run:
+        return
+
+    from database.storage import upload_questions
+    from pipeline.checkpoint import chunk_key, manifest_for
+    from pipeline.dedup import DuplicateIndex
+    from config.settings import DEDUP_INDEX_PATH, DEDUP_THRESHOLD
+
+    dedup_index = DuplicateIndex.load_or_create(DEDUP_INDEX_PATH)
+
+    metas = {meta["custom_id"]: meta for meta in _read_jsonl(_meta_path(args.requests))}
+    manifests = {}
+    for custom_id, questions in questions_by_id.items():
+        meta = metas[custom_id]
+        manifest = None
+        if meta["source"] is not None:
+            key = (meta["source"], meta["sections"][0])
+            if key not in manifests:
+                manifests[key] = manifest_for(*key)
+            manifest = manifests[key]
+            # Ingesting the same results file twice must not upload duplicates
+            questions = [q for q in questions if not manifest.is_done(meta["source"], chunk_key(meta["chunk"]), q.difficulty)]
+            if not questions:
+                continue
+
+        produced = {q.difficulty for q in questions}
+        questions = dedup_index.filter_new(questions, DEDUP_THRESHOLD)
+        question_ids = upload_questions(questions) if questions else []
+        dedup_index.add_many(question_ids, questions)
+        if manifest is None:
+            continue
+        # Record the units as done so an interactive main.py run over the same source skips them;
+        # difficulties the reply had no usable questions for stay pending
+        for difficulty in meta["difficulties"]:
+            if difficulty not in produced:
+                continue
+            ids = [qid for q, qid in zip(questions, question_ids) if q.difficulty == difficulty]
+            manifest.mark_done(meta["source"], chunk_key(meta["chunk"]), difficulty, ids)
+    dedup_index.save(DEDUP_INDEX_PATH)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stage and ingest OpenAI Batch API generation runs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    prepare = commands.add_parser("prepare", help="Write a JSONL request file for a PDF or directory of PDFs.")
+    prepare.add_argument("source")
+    prepare.add_argument("--section", default="math")
+    prepare.add_argument("--num-questions", type=int, default=1)
+    prepare.add_argument("--per-difficulty", action="store_true", help="One request per chunk x difficulty.")
+    prepare.add_argument("--out", required=True)
+    prepare.set_defaults(run=_prepare)
+
+    ingest = commands.add_parser("ingest", help="Parse a results file and upload the questions.")
+    ingest.add_argument("requests")
+    ingest.add_argument("results")
+    ingest.add_argument("--offline", action="store_true", help="Don't call the LLM to tag questions with invalid tags.")
+    ingest.add_argument("--dry-run", action="store_true", help="Parse and report only; don't upload.")
+    ingest.set_defaults(run=_ingest)
+
+    args = parser.parse_args()
+    from config.settings import METRICS_PATH
+    try:
+        args.run(args)
+    finally:
+        metrics.export_json(METRICS_PATH)
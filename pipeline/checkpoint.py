@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+import threading
+
+from config.settings import CHECKPOINT_DIR
+
+
+def chunk_key(chunk: str) -> str:
+    """
+    Identifies a chunk by its text rather than its position, so changing the chunking
+    settings between runs can't map done flags onto different chunks.
+    """
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:16]
+
+
+class RunManifest:
+    """
+    Append-only JSONL record of the (source, chunk, difficulty) units whose
+    questions have been uploaded, with chunks identified by chunk_key(). Each
+    completed unit is flushed to disk as soon as it is marked, so a crash loses
+    at most the unit in flight and a restart only has to do the remaining work.
+    A unit is only marked once generation produced questions for it; units whose
+    reply was unusable stay pending and are retried by the next run.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # a torn last line from a crash
+                    self.done[self._unit(entry["source"], entry["chunk"], entry["difficulty"])] = entry.get("question_ids", [])
+
+    @staticmethod
+    def _unit(source: str, chunk, difficulty: str) -> tuple:
+        return (source, str(chunk), difficulty)
+
+    def is_done(self, source: str, chunk, difficulty: str) -> bool:
+        return self._unit(source, chunk, difficulty) in self.done
+
+    def mark_done(self, source: str, chunk, difficulty: str, question_ids: list = None):
+        """Records a unit as uploaded, together with the question IDs it produced."""
+        entry = {"source": source, "chunk": chunk, "difficulty": difficulty, "question_ids": question_ids or []}
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.done[self._unit(source, chunk, difficulty)] = entry["question_ids"]
+
+    def __len__(self):
+        return len(self.done)
+
+
+def manifest_for(source: str, section: str) -> RunManifest:
+    """The manifest shared by every run (interactive or batch) over `source` for `section`."""
+    name = f"{os.path.splitext(os.path.basename(source))[0]}.{section}.jsonl"
+    return RunManifest(os.path.join(CHECKPOINT_DIR, name))
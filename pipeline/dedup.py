@@ -0,0 +1,247 @@
+import hashlib
+import os
+import re
+
+import numpy as np
+
+from config.settings import DEDUP_THRESHOLD
+from pipeline.metrics import metrics
+
+# Mersenne prime for the universal hash family used by MinHash
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def question_fingerprint_text(question) -> str:
+    """The text compared for near-duplicates: the stem plus all options in key order."""
+    if hasattr(question, "to_dict"):
+        question = question.to_dict()
+    options = question.get("options") or {}
+    if isinstance(options, dict):
+        options = [options[key] for key in sorted(options)]
+    return " ".join([str(question.get("question_text", ""))] + [str(option) for option in options])
+
+
+def image_key(question) -> str:
+    """
+    Identity of a question's figure: the content hash that uploaded images are named by
+    (images/<sha256>.<ext>), or the URL itself for other images; "" for text questions.
+    """
+    image_url = question.get("image_url") if isinstance(question, dict) else getattr(question, "image_url", None)
+    if not image_url:
+        return ""
+    stem = os.path.splitext(image_url.rstrip("/").rsplit("/", 1)[-1])[0]
+    return stem if re.fullmatch(r"[0-9a-f]{64}", stem) else image_url
+
+
+def _shingle_hashes(text: str, k: int = 3, salt: str = "") -> np.ndarray:
+    """
+    32-bit hashes of the word k-shingles of normalized text (single words for very short
+    text). A non-empty `salt` (an image key) is mixed into every hash, so questions about
+    different figures share no shingles however similar their wording.
+    """
+    words = re.sub(r"[^a-z0-9]+", " ", text.lower()).split()
+    if len(words) >= k:
+        shingles = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+    else:
+        shingles = set(words) or {""}
+    if salt:
+        shingles = {f"{salt}\x1f{s}" for s in shingles}
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+
+
+class DuplicateIndex:
+    """
+    MinHash + LSH index over question text and options. Signatures are stored in
+    one preallocated (capacity, num_perm) array that doubles when full, so adds
+    write rows in place and queries never restack it; each of `bands` hash tables maps a band of `rows`
+    signature values to the row numbers sharing it, so a lookup only compares
+    against the few candidates colliding in at least one band.
+    With 16 bands x 8 rows, pairs above ~0.7 Jaccard similarity almost always
+    collide, so thresholds of 0.75 and up are found reliably.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_MAX_HASH), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_MAX_HASH), size=num_perm, dtype=np.uint64)
+        self.ids = []
+        self._signatures = np.empty((0, num_perm), dtype=np.uint64)
+        self._tables = [{} for _ in range(bands)]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def signature(self, text: str, salt: str = "") -> np.ndarray:
+        """MinHash signature of one text: the minimum of each permuted hash over its shingles."""
+        hashes = _shingle_hashes(text, salt=salt)
+        # (num_perm, 1) x (n_shingles,) -> (num_perm, n_shingles); a, x < 2^32 so a*x + b fits in uint64
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1)
+
+    def signatures(self, texts: list, block_size: int = 1000, salts: list = None) -> np.ndarray:
+        """
+        Signatures for many texts, vectorized across the whole block: all shingle hashes
+        are permuted in one array op and reduced per text with np.minimum.reduceat.
+        """
+        salts = salts or [""] * len(texts)
+        blocks = [np.empty((0, self.num_perm), dtype=np.uint64)]
+        for start in range(0, len(texts), block_size):
+            hashes = [_shingle_hashes(text, salt=salt) for text, salt in zip(texts[start:start + block_size], salts[start:start + block_size])]
+            offsets = np.cumsum([0] + [len(h) for h in hashes[:-1]])
+            permuted = (self._a[:, None] * np.concatenate(hashes)[None, :] + self._b[:, None]) % _PRIME
+            blocks.append(np.minimum.reduceat(permuted, offsets, axis=1).T)
+        return np.vstack(blocks)
+
+    def _band_keys(self, signature: np.ndarray) -> list:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _matrix(self) -> np.ndarray:
+        return self._signatures[:len(self.ids)]
+
+    def _reserve(self, rows: int):
+        """Grows the signature buffer (at least doubling it) so `rows` more rows fit."""
+        needed = len(self.ids) + rows
+        if needed <= len(self._signatures):
+            return
+        grown = np.empty((max(needed, 2 * len(self._signatures), 1024), self.num_perm), dtype=np.uint64)
+        grown[:len(self.ids)] = self._matrix()
+        self._signatures = grown
+
+    def _add_signature(self, question_id: str, signature: np.ndarray):
+        self._reserve(1)
+        row = len(self.ids)
+        self._signatures[row] = signature
+        self.ids.append(question_id)
+        for table, key in zip(self._tables, self._band_keys(signature)):
+            table.setdefault(key, []).append(row)
+
+    def question_signatures(self, questions: list) -> np.ndarray:
+        """Signatures of questions' fingerprint text, salted with their image keys."""
+        return self.signatures([question_fingerprint_text(q) for q in questions], salts=[image_key(q) for q in questions])
+
+    def add(self, question_id: str, question: dict):
+        self._add_signature(question_id, self.question_signatures([question])[0])
+
+    def add_many(self, question_ids: list, questions: list):
+        for question_id, signature in zip(question_ids, self.question_signatures(questions)):
+            self._add_signature(question_id, signature)
+
+    def discard(self, question_ids: list):
+        """
+        Stops the given questions from matching, e.g. to roll back a reservation whose
+        upload failed. Their rows stay allocated (and are still written by save()), so
+        this is meant for short-lived, unsaved indexes.
+        """
+        discarded = set(question_ids)
+        for row, question_id in enumerate(self.ids):
+            if question_id not in discarded:
+                continue
+            for table, key in zip(self._tables, self._band_keys(self._signatures[row])):
+                rows = table.get(key, [])
+                if row in rows:
+                    rows.remove(row)
+
+    def _query_signature(self, signature: np.ndarray) -> tuple:
+        candidates = set()
+        for table, key in zip(self._tables, self._band_keys(signature)):
+            candidates.update(table.get(key, ()))
+        if not candidates:
+            return None, 0.0
+        rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarity = (self._matrix()[rows] == signature).mean(axis=1)
+        best = int(similarity.argmax())
+        return self.ids[rows[best]], float(similarity[best])
+
+    def query(self, question: dict) -> tuple:
+        """Returns (closest_question_id, estimated_jaccard), or (None, 0.0) if nothing collides."""
+        return self._query_signature(self.question_signatures([question])[0])
+
+    def check_batch(self, questions: list, threshold: float = DEDUP_THRESHOLD) -> list:
+        """
+        Checks a whole generated batch at once. Returns one (duplicate_of, similarity)
+        per question, where duplicate_of is an existing question ID, "batch:<i>" for an
+        earlier question in the same batch, or None when the question is novel.
+        The index itself is not modified.
+        """
+        signatures = self.question_signatures(questions)
+        results = []
+        local_tables = [{} for _ in range(self.bands)]
+        for i, signature in enumerate(signatures):
+            match, similarity = self._query_signature(signature)
+            if similarity < threshold:
+                match, similarity = None, 0.0
+            # Also compare against earlier questions of this batch
+            keys = self._band_keys(signature)
+            local = {j for table, key in zip(local_tables, keys) for j in table.get(key, ())}
+            if local:
+                rows = np.fromiter(local, dtype=np.int64, count=len(local))
+                local_similarity = (signatures[rows] == signature).mean(axis=1)
+                best = int(local_similarity.argmax())
+                if local_similarity[best] >= threshold and local_similarity[best] > similarity:
+                    match, similarity = f"batch:{int(rows[best])}", float(local_similarity[best])
+            for table, key in zip(local_tables, keys):
+                table.setdefault(key, []).append(i)
+            results.append((match, similarity))
+        return results
+
+    def filter_new(self, questions: list, threshold: float = DEDUP_THRESHOLD, flag_only: bool = False) -> list:
+        """
+        Drops questions that near-duplicate the index or an earlier question in the batch.
+        With flag_only they are kept but have duplicate_of set instead.
+        """
+        kept = []
+        for q, (match, similarity) in zip(questions, self.check_batch(questions, threshold)):
+            if match is None:
+                kept.append(q)
+            elif flag_only:
+                q.duplicate_of = match
+                kept.append(q)
+                metrics.count("questions.flagged_duplicates")
+            else:
+                metrics.count("questions.rejected_duplicates")
+                print(f"INFO: Rejected near-duplicate question ({similarity:.2f} similar to {match}).")
+        return kept
+
+    def save(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(
+                f, signatures=self._matrix(), ids=np.array(self.ids, dtype=str),
+                params=np.array([self.num_perm, self.bands, self.seed])
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "DuplicateIndex":
+        with np.load(path) as data:
+            num_perm, bands, seed = (int(v) for v in data["params"])
+            index = cls(num_perm=num_perm, bands=bands, seed=seed)
+            index._reserve(len(data["ids"]))
+            for question_id, signature in zip(data["ids"].tolist(), data["signatures"]):
+                index._add_signature(question_id, signature)
+        return index
+
+    @classmethod
+    def load_or_create(cls, path: str) -> "DuplicateIndex":
+        if path and os.path.exists(path):
+            return cls.load(path)
+        return cls()
+
+    @classmethod
+    def from_questions(cls, questions, **kwargs) -> "DuplicateIndex":
+        """Builds an index from Questions or question dicts, e.g. BankSnapshot().questions.values()."""
+        questions = list(questions)
+        index = cls(**kwargs)
+        index.add_many([q.question_id if hasattr(q, "question_id") else q["question_id"] for q in questions], questions)
+        return index
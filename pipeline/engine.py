@@ -0,0 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config.settings import MAX_CONCURRENCY
+
+
+def run_ordered(fn, jobs: list, max_workers: int = MAX_CONCURRENCY, default=None, on_result=None) -> list:
+    """
+    Runs fn(**job) for every job dict on a thread pool and returns the results
+    in the same order as `jobs`. A job that raises is logged and yields `default`.
+    If given, on_result(index, result) is called on the calling thread as each
+    successful job finishes, e.g. to upload and checkpoint incrementally; an
+    on_result that raises is logged and the remaining jobs carry on.
+    Rate limiting and retries happen inside the OpenAI wrapper, so `max_workers`
+    only bounds how many requests are in flight at once.
+    """
+    results = [default] * len(jobs)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fn, **job): i for i, job in enumerate(jobs)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                print(f"ERROR: Job {i + 1}/{len(jobs)} failed: {e}")
+            else:
+                if on_result:
+                    try:
+                        on_result(i, results[i])
+                    except Exception as e:
+                        print(f"ERROR: Handling the result of job {i + 1}/{len(jobs)} failed: {e}")
+            print(f"INFO: Completed {done}/{len(jobs)} jobs.")
+    return results
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+import numpy as np
+
+from config.settings import FIGURE_MIN_SIDE, FIGURE_MIN_ENTROPY, FIGURE_MAX_REPEATS
+
+# Formats the vision API accepts; anything else (jpx, jbig2, tiff, ...) is re-encoded as PNG
+VISION_FORMATS = ("png", "jpeg", "jpg", "gif", "webp")
+
+# Text within this many points of a figure's bounding box counts as its context
+CONTEXT_MARGIN = 72
+MAX_CONTEXT_CHARS = 1500
+
+
+def _gray_pixels(pix) -> np.ndarray:
+    """Decoded image as a 2-D uint8 grayscale array."""
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)  # gray conversion keeps alpha, which would interleave with the samples
+    if pix.n != 1:
+        pix = fitz.Pixmap(fitz.csGRAY, pix)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+
+
+def image_entropy(gray: np.ndarray) -> float:
+    """Shannon entropy (bits) of the grayscale histogram; flat fills and rules score near 0."""
+    counts = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    p = counts[counts > 0] / counts.sum()
+    return float(-(p * np.log2(p)).sum())
+
+
+def difference_hash(gray: np.ndarray, size: int = 8) -> str:
+    """64-bit dHash: compares neighbouring cells of a (size x size+1) downsample, robust to re-encoding and scaling."""
+    rows = np.linspace(0, gray.shape[0] - 1, size).astype(int)
+    cols = np.linspace(0, gray.shape[1] - 1, size + 1).astype(int)
+    small = gray[np.ix_(rows, cols)].astype(np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return f"{int(np.packbits(bits).view('>u8')[0]):016x}"
+
+
+def _as_vision_image(extracted: dict, pix) -> tuple:
+    """(ext, bytes) of an extracted image in a format the vision API accepts."""
+    if extracted["ext"].lower() in VISION_FORMATS:
+        return extracted["ext"], extracted["image"]
+    if pix.colorspace is not None and pix.colorspace.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)  # CMYK and friends can't be written as PNG
+    return "png", pix.tobytes("png")
+
+
+def _page_context(page, rects) -> str:
+    """Text near the figure on its page, falling back to the whole page."""
+    text = ""
+    for rect in rects:
+        clip = fitz.Rect(rect.x0 - CONTEXT_MARGIN, rect.y0 - CONTEXT_MARGIN, rect.x1 + CONTEXT_MARGIN, rect.y1 + CONTEXT_MARGIN)
+        text += page.get_text("text", clip=clip)
+    if not text.strip():
+        text = page.get_text()
+    return " ".join(text.split())[:MAX_CONTEXT_CHARS]
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int, min_side: int, min_entropy: float) -> list:
+    """Worker: candidate figures on pages [start, stop) that pass the size and entropy filters."""
+    candidates = []
+    doc = fitz.open(pdf_path)
+    try:
+        for page_number in range(start, stop):
+            page = doc[page_number]
+            for image_number, info in enumerate(page.get_images(full=True), start=1):
+                xref = info[0]
+                try:
+                    extracted = doc.extract_image(xref)
+                    if min(extracted["width"], extracted["height"]) < min_side:
+                        continue
+                    pix = fitz.Pixmap(extracted["image"])
+                    gray = _gray_pixels(pix)
+                    ext, image = _as_vision_image(extracted, pix)
+                except Exception as e:
+                    print(f"WARNING: Skipping unreadable image {xref} on page {page_number + 1}: {e}")
+                    continue
+                if image_entropy(gray) < min_entropy:
+                    continue
+                candidates.append({
+                    "page": page_number + 1,
+                    "index": image_number,
+                    "ext": ext,
+                    "image": image,
+                    "sha256": hashlib.sha256(image).hexdigest(),
+                    "dhash": difference_hash(gray),
+                    "context": _page_context(page, page.get_image_rects(xref)),
+                })
+    finally:
+        doc.close()
+    return candidates
+
+
+def extract_figures(pdf_path: str, output_dir: str = "extracted_images", min_side: int = FIGURE_MIN_SIDE,
+                    min_entropy: float = FIGURE_MIN_ENTROPY, max_repeats: int = FIGURE_MAX_REPEATS,
+                    max_workers: int = None) -> list:
+    """
+    Extracts the embedded figures of a PDF, walking page ranges in parallel processes.
+    Images smaller than `min_side` pixels or with low entropy are dropped as decorative,
+    images repeated on more than `max_repeats` pages (logos, headers) are dropped, and
+    remaining repeats are kept once (matched by content hash or perceptual hash).
+    Saves each figure as pageN_imgM.<ext> in `output_dir` (formats the vision API
+    doesn't accept are converted to PNG), writes a manifest.json there,
+    and returns the entries {"path", "page", "sha256", "context"} ready for
+    image_question_generation.generate_questions_for_images.
+    """
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+    workers = max_workers or os.cpu_count() or 1
+    step = max(1, -(-page_count // (workers * 4)))
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_extract_page_range, pdf_path, start, stop, min_side, min_entropy) for start, stop in ranges]
+        candidates = [candidate for future in futures for candidate in future.result()]
+
+    # Count on how many pages each image (by perceptual hash) appears
+    pages_by_hash = {}
+    for candidate in candidates:
+        pages_by_hash.setdefault(candidate["dhash"], set()).add(candidate["page"])
+
+    os.makedirs(output_dir, exist_ok=True)
+    figures, seen = [], set()
+    for candidate in candidates:
+        if len(pages_by_hash[candidate["dhash"]]) > max_repeats:
+            continue
+        if candidate["sha256"] in seen or candidate["dhash"] in seen:
+            continue
+        seen.update((candidate["sha256"], candidate["dhash"]))
+
+        path = os.path.join(output_dir, f"page{candidate['page']}_img{candidate['index']}.{candidate['ext']}")
+        with open(path, "wb") as f:
+            f.write(candidate["image"])
+        figures.append({
+            "path": path,
+            "page": candidate["page"],
+            "sha256": candidate["sha256"],
+            "context": f"Figure from page {candidate['page']} of {os.path.basename(pdf_path)}. Nearby text:\n{candidate['context']}",
+        })
+
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(figures, f, indent=2)
+    print(f"INFO: Kept {len(figures)} of {len(candidates)} candidate figures from {pdf_path}")
+    return figures
@@ -0,0 +1,151 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fitz
+
+from config.settings import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+
+# Sentence ends at . ! or ? (optionally followed by a closing quote/bracket) and whitespace
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def count_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), matching the rate limiter's."""
+    return len(text) // 4 + 1
+
+
+def iter_pdf_pages(pdf_path: str):
+    """Yields the text of each page lazily, so the whole book is never held in memory."""
+    doc = fitz.open(pdf_path)
+    try:
+        for page in doc:
+            yield page.get_text()
+    finally:
+        doc.close()
+
+
+def extract_text_from_pdf(pdf_path: str) -> str:
+    """Extracts all text from a given PDF file."""
+    return "".join(iter_pdf_pages(pdf_path))
+
+
+def _split_long(sentence: str, max_tokens: int) -> list:
+    """Splits a single over-budget sentence at whitespace (e.g. a long equation or table row)."""
+    pieces, current = [], []
+    for word in sentence.split():
+        if current and count_tokens(" ".join(current + [word])) > max_tokens:
+            pieces.append(" ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def _iter_units(pages, max_carry_tokens: int = CHUNK_MAX_TOKENS):
+    """
+    Yields (sentence, ends_paragraph) pairs from a stream of page texts. A trailing
+    sentence fragment at the end of a page is carried over to the next page so
+    sentences that span a page break stay whole. A fragment over `max_carry_tokens`
+    (pages of equations or tables with no sentence ends) is emitted as is instead,
+    so the carry never grows across the whole book.
+    """
+    carry = ""
+    for page_text in pages:
+        text = carry + page_text
+        paragraphs = _PARAGRAPH_BREAK.split(text)
+        last = paragraphs.pop()
+        for paragraph in paragraphs:
+            sentences = [s for s in _SENTENCE_END.split(paragraph) if s.strip()]
+            for j, sentence in enumerate(sentences):
+                yield " ".join(sentence.split()), j == len(sentences) - 1
+
+        sentences = [s for s in _SENTENCE_END.split(last) if s.strip()]
+        carry = ""
+        if sentences and not re.search(r"[.!?][\"')\]]*\s*$", last) and count_tokens(sentences[-1]) <= max_carry_tokens:
+            carry = sentences.pop() + " "
+        for sentence in sentences:
+            yield " ".join(sentence.split()), False
+
+    if carry.strip():
+        yield " ".join(carry.split()), True
+
+
+def iter_chunks(pages, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+    """
+    Packs sentences from a stream of page texts into chunks of at most `max_tokens`,
+    never cutting inside a word or sentence (unless one sentence alone exceeds the
+    budget). A chunk that is at least three quarters full is closed early at a
+    paragraph boundary. Consecutive chunks share up to `overlap_tokens` of trailing
+    sentences for context.
+    """
+    current, current_tokens, fresh = [], 0, 0
+
+    def flush():
+        nonlocal current, current_tokens, fresh
+        chunk = " ".join(current)
+        # Carry the last few sentences into the next chunk as overlap
+        overlap, overlap_size = [], 0
+        for sentence in reversed(current):
+            size = count_tokens(sentence)
+            if overlap_size + size > overlap_tokens:
+                break
+            overlap.insert(0, sentence)
+            overlap_size += size
+        current, current_tokens, fresh = overlap, overlap_size, 0
+        return chunk
+
+    for sentence, ends_paragraph in _iter_units(pages, max_tokens):
+        for piece in _split_long(sentence, max_tokens) if count_tokens(sentence) > max_tokens else [sentence]:
+            size = count_tokens(piece)
+            if current_tokens + size > max_tokens:
+                if fresh:
+                    yield flush()
+                if current_tokens + size > max_tokens:
+                    current, current_tokens = [], 0  # overlap doesn't fit alongside this piece
+            current.append(piece)
+            current_tokens += size
+            fresh += 1
+        if ends_paragraph and fresh and current_tokens >= 0.75 * max_tokens:
+            yield flush()
+
+    # Don't emit a final chunk that is nothing but overlap from the previous one
+    if fresh:
+        yield " ".join(current)
+
+
+def chunk_pdf(pdf_path: str, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> list:
+    """Streams a PDF page by page and returns its sentence-aware chunks."""
+    return list(iter_chunks(iter_pdf_pages(pdf_path), max_tokens, overlap_tokens))
+
+
+def list_pdfs(path: str) -> list:
+    """A single PDF path, or every PDF under a directory, sorted."""
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(
+        os.path.join(root, name)
+        for root, _, files in os.walk(path)
+        for name in files
+        if name.lower().endswith(".pdf")
+    )
+
+
+def iter_directory_chunks(directory: str, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS, max_workers: int = None):
+    """
+    Extracts and chunks every PDF under `directory` in parallel across a process pool.
+    Yields (pdf_path, chunks) as each document finishes; failed documents are logged and skipped.
+    """
+    pdf_paths = list_pdfs(directory)
+    print(f"INFO: Found {len(pdf_paths)} PDF(s) in {directory}")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(chunk_pdf, path, max_tokens, overlap_tokens): path for path in pdf_paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                yield path, future.result()
+            except Exception as e:
+                print(f"ERROR: Could not extract {path}: {e}")
@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# USD per 1M tokens (input, cached input, output); update when pricing changes
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+# Batch API requests are billed at half the interactive price
+BATCH_DISCOUNT = 0.5
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Metrics:
+    """
+    Thread-safe, process-wide run telemetry: per-stage latency histograms, counters,
+    and per-model LLM token usage with estimated cost. Exported as JSON at the end
+    of a run with export_json().
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started_at = time.time()
+            self.latencies = {}
+            self.counters = {}
+            self.usage = {}
+
+    def observe(self, stage: str, seconds: float):
+        with self.lock:
+            self.latencies.setdefault(stage, []).append(seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Times the enclosed block into `stage`'s latency histogram (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def count(self, name: str, n: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record_usage(self, model: str, usage):
+        """
+        Adds a response's `usage` (an SDK object, or a dict from a Batch API results file)
+        to the model's totals. Batch usage is recorded under "batch:<model>".
+        """
+        if usage is None:
+            return
+
+        def field(obj, name):
+            value = obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+            return value or 0
+
+        details = usage.get("prompt_tokens_details") if isinstance(usage, dict) else getattr(usage, "prompt_tokens_details", None)
+        with self.lock:
+            totals = self.usage.setdefault(model, {"calls": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0})
+            totals["calls"] += 1
+            totals["prompt_tokens"] += field(usage, "prompt_tokens")
+            totals["cached_prompt_tokens"] += field(details, "cached_tokens") if details else 0
+            totals["completion_tokens"] += field(usage, "completion_tokens")
+
+    @staticmethod
+    def _cost(model: str, totals: dict) -> float:
+        discount = 1.0
+        if model.startswith("batch:"):
+            model, discount = model[len("batch:"):], BATCH_DISCOUNT
+        prices = next((p for name, p in sorted(MODEL_PRICES.items(), key=lambda kv: -len(kv[0])) if model.startswith(name)), None)
+        if prices is None:
+            return 0.0
+        input_price, cached_price, output_price = prices
+        uncached = totals["prompt_tokens"] - totals["cached_prompt_tokens"]
+        return discount * (uncached * input_price + totals["cached_prompt_tokens"] * cached_price + totals["completion_tokens"] * output_price) / 1e6
+
+    @staticmethod
+    def _summarize(samples: list) -> dict:
+        ordered = sorted(samples)
+        n = len(ordered)
+        buckets = {f"le_{bound}": 0 for bound in LATENCY_BUCKETS}
+        buckets["le_inf"] = 0
+        for value in ordered:
+            key = next((f"le_{bound}" for bound in LATENCY_BUCKETS if value <= bound), "le_inf")
+            buckets[key] += 1
+        return {
+            "count": n,
+            "total_s": round(sum(ordered), 6),
+            "mean_s": round(sum(ordered) / n, 6),
+            "p50_s": round(ordered[n // 2], 6),
+            "p90_s": round(ordered[min(n - 1, int(n * 0.9))], 6),
+            "p99_s": round(ordered[min(n - 1, int(n * 0.99))], 6),
+            "max_s": round(ordered[-1], 6),
+            "histogram": buckets,
+        }
+
+    def summary(self) -> dict:
+        with self.lock:
+            usage = {model: dict(totals, estimated_cost_usd=round(self._cost(model, totals), 6)) for model, totals in self.usage.items()}
+            total_cost = sum(totals["estimated_cost_usd"] for totals in usage.values())
+            questions = self.counters.get("questions.uploaded", 0)
+            return {
+                "wall_time_s": round(time.time() - self.started_at, 3),
+                "stages": {stage: self._summarize(samples) for stage, samples in sorted(self.latencies.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "llm_usage": usage,
+                "estimated_cost_usd": round(total_cost, 6),
+                "estimated_cost_per_question_usd": round(total_cost / questions, 6) if questions else None,
+            }
+
+    def export_json(self, path: str) -> dict:
+        summary = self.summary()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"INFO: Wrote run metrics to {path} (estimated cost ${summary['estimated_cost_usd']:.4f}).")
+        return summary
+
+
+# Shared by every module so one run produces one report
+metrics = Metrics()
@@ -1,6 +1,113 @@
 import json
+import threading
 import openai
-from config.settings import DETAILED_SYLLABUS, SECTION_TAGS
+from Question import Question, normalize_tags
+from config.settings import DETAILED_SYLLABUS, SECTION_TAGS, RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_MB
+from pipeline.cache import ResponseCache, cache_key
+from pipeline.metrics import metrics
+from pipeline.rate_limit import RateLimiter, call_with_retries, estimate_tokens
+
+# Shared by every thread in the process so concurrent calls respect the account quota
+_rate_limiter = RateLimiter()
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def _get_response_cache():
+    """Opens the on-disk response cache on first use; None when caching is disabled."""
+    global _response_cache
+    if not RESPONSE_CACHE_PATH:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(RESPONSE_CACHE_PATH, max_bytes=RESPONSE_CACHE_MAX_MB * 1024 * 1024)
+    return _response_cache
+
+def _is_json(content) -> bool:
+    try:
+        json.loads(content)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+def _chat_completion(completion_tokens: int = 1000, use_cache: bool = True, parse=None, **kwargs):
+    """
+    Rate-limited, retrying, cached wrapper around openai.chat.completions.create.
+    Returns the message content, or parse(content) if `parse` is given. The cache key
+    covers the model, the full messages (prompt, chunk, difficulty, section, image URL)
+    and sampling settings. Only usable responses are cached, so a bad reply is retried
+    next run: with `parse`, those it turns into a non-empty result; otherwise those
+    that parse as JSON. A cached response `parse` finds unusable is requested again.
+    `completion_tokens` is the expected response size reserved against the tokens/min budget.
+    """
+    cache = _get_response_cache() if use_cache else None
+    key = cache_key(**kwargs) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            result = parse(cached) if parse else cached
+            if not parse or result:
+                metrics.count("llm.cache_hits")
+                return result
+
+    def create(**kwargs):
+        # Every attempt, retries included, goes through the shared requests/min and tokens/min buckets
+        with metrics.timer("llm.rate_limit_wait"):
+            _rate_limiter.acquire(estimate_tokens(kwargs["messages"]) + completion_tokens)
+        with metrics.timer(f"llm.{kwargs['model']}"):
+            return openai.chat.completions.create(**kwargs)
+
+    resp = call_with_retries(create, **kwargs)
+    metrics.record_usage(kwargs["model"], getattr(resp, "usage", None))
+    content = resp.choices[0].message.content
+
+    result = parse(content) if parse else content
+    if cache and (result if parse else _is_json(content)):
+        cache.set(key, content)
+    return result
+
+def tag_questions_batch(question_texts: list, section: str) -> list:
+    """
+    Tags several questions of the same section with a single LLM call.
+    Returns one list of tags per question, in the same order.
+    """
+    tags_list = SECTION_TAGS.get(section, [])
+    if not tags_list:
+        return [["untagged"] for _ in question_texts]
+    if not question_texts:
+        return []
+
+    system_prompt = (
+        "You are an expert curriculum developer. For each numbered question, "
+        "select the most relevant tags from the given list. "
+        "Return a JSON object with a single key 'results' containing an array of objects "
+        "of the form {\"index\": <question number>, \"tags\": [<selected tag strings>]}."
+    )
+    numbered = "\n\n".join(f"QUESTION {i}:\n{text}" for i, text in enumerate(question_texts))
+    user_prompt = f"{numbered}\n\nAVAILABLE TAGS:\n{json.dumps(tags_list, indent=2)}"
+
+    try:
+        content = _chat_completion(
+            completion_tokens=60 * len(question_texts),
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=0,
+            response_format={"type": "json_object"}
+        )
+        results = json.loads(content).get("results", [])
+        tags_by_index = {}
+        for r in results:
+            try:
+                tags_by_index[int(r["index"])] = normalize_tags(r.get("tags"), section)
+            except (TypeError, KeyError, ValueError):
+                continue  # a result without a usable question number; that question stays untagged
+        return [tags_by_index.get(i) or ["untagged"] for i in range(len(question_texts))]
+    except Exception as e:
+        print(f"ERROR during batch tagging: {e}")
+        return [["tagging_error"] for _ in question_texts]
 
 def tag_question_by_concept(question_text: str, section: str) -> list:
     """
@@ -19,7 +126,8 @@ def tag_question_by_concept(question_text: str, section: str) -> list:
     user_prompt = f"QUESTION:\n{question_text}\n\nAVAILABLE TAGS:\n{json.dumps(tags_list, indent=2)}"
 
     try:
-        resp = openai.chat.completions.create(
+        content = _chat_completion(
+            completion_tokens=100,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -28,80 +136,169 @@ def tag_question_by_concept(question_text: str, section: str) -> list:
             temperature=0,
             response_format={"type": "json_object"}
         )
-        result = json.loads(resp.choices[0].message.content)
-        return result.get("tags", ["untagged"])
+        result = json.loads(content)
+        return normalize_tags(result.get("tags"), section) or ["untagged"]
     except Exception as e:
         print(f"ERROR during tagging: {e}")
         return ["tagging_error"]
 
-def generate_mcqs(chunk, difficulty, section, num_questions=2, image_url=None):
+# NEW: More detailed, action-oriented difficulty definitions
+DIFFICULTY_DEFINITIONS = {
+    "easy": "An 'easy' SAT question is straightforward and requires minimal interpretation. The answer is usually found directly in the provided text or image. It should test a core concept without complex steps. The incorrect options should be clearly wrong.",
+
+    "medium": "A 'medium' SAT question requires multiple steps of reasoning or calculation. The user might need to synthesize information from different parts of the text or image. The incorrect options (distractors) should be plausible and target common student errors.",
+
+    "hard": "A 'hard' SAT question is complex and requires deep analytical or inferential skills. The question may be phrased in a convoluted way, and the answer might be the 'best' choice among several plausible options. The distractors must be very tempting and specifically designed to mislead students who have a superficial understanding of the topic."
+}
+
+# NEW: A more professional and demanding system prompt. It is identical for every call so
+# it forms the start of the cacheable prompt prefix.
+SYSTEM_PROMPT = (
+    "You are a psychometrician and expert SAT test developer. Your sole focus is creating high-quality, realistic test questions that precisely mirror the cognitive complexity and style of the official College Board SAT exam.\n"
+    "Your questions must be novel and challenging. Critically analyze the provided syllabus and difficulty definitions to inform your creation.\n"
+    "Above all, create plausible, tricky distractors for the incorrect answers. An excellent 'hard' question is defined by its clever and tempting incorrect options.\n"
+    "Return your response exclusively in the specified JSON format."
+)
+
+def _static_instructions(sections: list, inline_tags: bool) -> str:
     """
-    Generates MCQs using a more sophisticated prompt to achieve true SAT-level difficulty.
+    The part of the user prompt that depends only on the sections and tagging mode:
+    difficulty definitions, syllabus, allowed tags and output format. It comes before
+    the chunk so consecutive calls share a long identical prefix, which lets the
+    provider's automatic prompt caching apply.
     """
-    # NEW: More detailed, action-oriented difficulty definitions
-    difficulty_definitions = {
-        "easy": "An 'easy' SAT question is straightforward and requires minimal interpretation. The answer is usually found directly in the provided text or image. It should test a core concept without complex steps. The incorrect options should be clearly wrong.",
-        
-        "medium": "A 'medium' SAT question requires multiple steps of reasoning or calculation. The user might need to synthesize information from different parts of the text or image. The incorrect options (distractors) should be plausible and target common student errors.",
-        
-        "hard": "A 'hard' SAT question is complex and requires deep analytical or inferential skills. The question may be phrased in a convoluted way, and the answer might be the 'best' choice among several plausible options. The distractors must be very tempting and specifically designed to mislead students who have a superficial understanding of the topic."
-    }
+    tags_field = ', "tags": ["<one or more allowed tags for its section>"]' if inline_tags else ""
+    parts = [
+        "### Difficulty Levels & Definitions to Embody",
+        "\n".join(f"'{name}': {definition}" for name, definition in DIFFICULTY_DEFINITIONS.items()),
+    ]
+    for section in sections:
+        parts += ["---", f"### Detailed SAT Syllabus: {section} (Core Topics)", json.dumps(DETAILED_SYLLABUS.get(section, {}), indent=2)]
+        if inline_tags:
+            parts += [f"Allowed {section} tags (use these exact strings only):", json.dumps(SECTION_TAGS.get(section, []))]
+    parts += [
+        "---",
+        "### Output Format",
+        'Return a JSON object of the form {"questions": [{"section": "<section>", "difficulty": "<easy|medium|hard>", '
+        '"question_text": "...", "options": {"A": "...", "B": "...", "C": "...", "D": "..."}, '
+        f'"correct": "<option letter>"{tags_field}}}]}}.',
+    ]
+    return "\n".join(parts)
 
-    # NEW: A more professional and demanding system prompt
-    system_prompt = (
-        f"You are a psychometrician and expert SAT {section} test developer. Your sole focus is creating high-quality, realistic test questions that precisely mirror the cognitive complexity and style of the official College Board SAT exam.\n"
-        "Your questions must be novel and challenging. Critically analyze the provided syllabus and difficulty definition to inform your creation.\n"
-        "Above all, create plausible, tricky distractors for the incorrect answers. An excellent 'hard' question is defined by its clever and tempting incorrect options.\n"
-        "Return your response exclusively in the specified JSON format."
-    )
-    
-    user_prompt_text = f"""
-    ### Difficulty Level & Definition to Embody
-    '{difficulty}': {difficulty_definitions[difficulty]}
-
-    ---
-    ### Detailed SAT Syllabus (Core Topics)
-    {json.dumps(DETAILED_SYLLABUS.get(section, {}), indent=2)}
-
-    ---
-    ### Reference Asset (for thematic inspiration)
-    {chunk}
-
-    ---
-    ### Your Task
-    Generate exactly {num_questions} questions that perfectly match the '{difficulty}' definition. For 'hard' questions, focus on creating subtle and challenging answer choices.
-    """
-    
+def build_generation_messages(chunk, sections: list, difficulties: list, num_questions=2, image_url=None, inline_tags=True) -> list:
+    """Builds the chat messages for one generation call covering every section x difficulty pair."""
+    combos = ", ".join(f"{section}/{difficulty}" for section in sections for difficulty in difficulties)
+    user_prompt_text = f"""{_static_instructions(sections, inline_tags)}
+
+---
+### Reference Asset (for thematic inspiration)
+{chunk}
+
+---
+### Your Task
+For each of these section/difficulty combinations: {combos}
+generate exactly {num_questions} question(s) that perfectly match that difficulty's definition, labelled with its section and difficulty. For 'hard' questions, focus on creating subtle and challenging answer choices.
+"""
     user_content = [{"type": "text", "text": user_prompt_text}]
 
     if image_url:
-        print(f"INFO: Generating question with image: {image_url}")
         user_content.append({
             "type": "image_url",
             "image_url": {"url": image_url}
         })
 
-    
-    resp = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_content}
-        ],
-        temperature=0.5, # Increase temperature for more creativity and less repetitive questions
-        response_format={"type": "json_object"}
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_content}
+    ]
+
+def generation_request_body(chunk, sections: list, difficulties: list, num_questions=2, image_url=None, inline_tags=True) -> dict:
+    """The chat completions request body for one generation call (also used for Batch API files)."""
+    return {
+        "model": "gpt-4o",
+        "messages": build_generation_messages(chunk, sections, difficulties, num_questions, image_url, inline_tags),
+        "temperature": 0.5, # Increase temperature for more creativity and less repetitive questions
+        "response_format": {"type": "json_object"}
+    }
+
+def parse_generated_questions(content: str, sections: list, difficulties: list, image_url=None, inline_tags=True) -> list:
+    """
+    Parses a generation response into validated Question records. Each item is checked
+    on its own, so one malformed question doesn't cost the rest of the batch: items
+    labelled with a section/difficulty that wasn't requested, or failing
+    Question.from_model_output, are dropped with a warning. With a single requested
+    value the label is filled in. Questions left without a valid tag get tags == []
+    for the caller to fill in.
+    """
+    result = json.loads(content)
+    mcqs = result.get("questions", result) if isinstance(result, dict) else result
+    parsed = []
+    for q in mcqs:
+        if not isinstance(q, dict):
+            print(f"WARNING: Dropping malformed question: {q!r}")
+            continue
+        section = str(q.get("section", "")).lower() if len(sections) > 1 else sections[0]
+        difficulty = str(q.get("difficulty", "")).lower() if len(difficulties) > 1 else difficulties[0]
+        if section not in sections or difficulty not in difficulties:
+            print(f"WARNING: Dropping question with unexpected section/difficulty: {section}/{difficulty}")
+            continue
+        question, problem = Question.from_model_output(q, section=section, difficulty=difficulty, image_url=image_url)
+        if question is None:
+            print(f"WARNING: Dropping invalid question ({problem}).")
+            metrics.count("questions.invalid")
+            continue
+        if not inline_tags:
+            question.tags = []
+        parsed.append(question)
+    return parsed
+
+def fill_missing_tags(mcqs: list) -> list:
+    """Tags every question that has no valid tags yet, with one batched call per section."""
+    by_section = {}
+    for q in mcqs:
+        if not q.tags:
+            by_section.setdefault(q.section, []).append(q)
+    for section, untagged in by_section.items():
+        metrics.count("questions.fallback_tagged", len(untagged))
+        batch_tags = tag_questions_batch([q.question_text for q in untagged], section)
+        for q, tags in zip(untagged, batch_tags):
+            q.tags = tags
+    return mcqs
+
+def generate_mcqs_multi(chunk, sections: list, difficulties: list = None, num_questions=1, image_url=None, inline_tags=True, tag_missing=True):
+    """
+    Generates questions for several difficulties (and optionally several sections) of
+    one chunk or image in a single call, instead of resending the chunk, syllabus and
+    instructions once per combination. `num_questions` is per section x difficulty.
+    With tag_missing=False, questions without valid tags are returned untagged for a
+    separate tagging step.
+    """
+    difficulties = difficulties or list(DIFFICULTY_DEFINITIONS)
+    if image_url:
+        print(f"INFO: Generating question with image: {image_url}")
+
+    def parse(content):
+        try:
+            return parse_generated_questions(content, sections, difficulties, image_url, inline_tags)
+        except Exception as e:
+            print(f"Error parsing MCQs from model output: {e}")
+            metrics.count("llm.unparseable_responses")
+            return []
+
+    # A reply without usable questions isn't cached, so the next run asks again
+    mcqs = _chat_completion(
+        completion_tokens=400 * num_questions * len(sections) * len(difficulties),
+        parse=parse,
+        **generation_request_body(chunk, sections, difficulties, num_questions, image_url, inline_tags)
     )
+    metrics.count("questions.generated", len(mcqs))
+    return fill_missing_tags(mcqs) if tag_missing else mcqs
 
-    try:
-        content = json.loads(resp.choices[0].message.content)
-        mcqs = content.get("questions", content)
-        for q in mcqs:
-            q["difficulty"] = difficulty
-            q["section"] = section
-            if image_url:
-                q["image_url"] = image_url
-            q["tags"] = tag_question_by_concept(q["question_text"], section)
-        return mcqs
-    except Exception as e:
-        print(f"Error parsing MCQs from model output: {e}")
-        return []
\ No newline at end of file
+def generate_mcqs(chunk, difficulty, section, num_questions=2, image_url=None, inline_tags=True):
+    """
+    Generates MCQs using a more sophisticated prompt to achieve true SAT-level difficulty.
+    With inline_tags the model also tags each question from SECTION_TAGS[section] in the
+    same response; otherwise (or for questions whose tags can't be repaired locally) all
+    questions are tagged together in one batched call.
+    """
+    return generate_mcqs_multi(chunk, [section], [difficulty], num_questions, image_url, inline_tags)
@@ -0,0 +1,94 @@
+import random
+import threading
+import time
+
+from config.settings import MAX_RETRIES, REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE
+from pipeline.metrics import metrics
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Holds up to `capacity` tokens and refills
+    continuously at `capacity` tokens per `period` seconds.
+    """
+
+    def __init__(self, capacity: int, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.refill_rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def acquire(self, amount: float = 1.0):
+        """Blocks until `amount` tokens are available, then takes them."""
+        # A single request larger than the whole bucket would otherwise wait forever
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.refill_rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """Combines a requests/min bucket and a tokens/min bucket."""
+
+    def __init__(self, requests_per_minute: int = REQUESTS_PER_MINUTE, tokens_per_minute: int = TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def acquire(self, num_tokens: int):
+        self.requests.acquire(1)
+        self.tokens.acquire(num_tokens)
+
+
+def estimate_tokens(messages: list) -> int:
+    """Rough prompt size estimate (~4 characters per token) for rate limiting."""
+    chars = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for part in content:
+            if part.get("type") == "text":
+                chars += len(part["text"])
+            else:
+                # Images are billed at a flat-ish rate; reserve a typical budget
+                chars += 765 * 4
+    return chars // 4 + 1
+
+
+def is_retryable(exc: Exception) -> bool:
+    """True for rate-limit (429), server (5xx), timeout and connection errors."""
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(exc).__name__ in ("APITimeoutError", "APIConnectionError", "RateLimitError")
+
+
+def call_with_retries(fn, *args, max_retries: int = MAX_RETRIES, base_delay: float = 1.0, max_delay: float = 60.0, **kwargs):
+    """
+    Calls fn(*args, **kwargs), retrying retryable errors with exponential
+    backoff and full jitter. Non-retryable errors are raised immediately.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            attempt += 1
+            metrics.count("llm.retries")
+            print(f"WARNING: Retryable API error ({e}); retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
@@ -0,0 +1,214 @@
+import functools
+import math
+import os
+import re
+
+import numpy as np
+
+from Question import normalize_tags
+from config.settings import BANK_SNAPSHOT_PATH, CHUNK_BUDGET, CHUNK_BUDGET_RATIO, DETAILED_SYLLABUS, SECTION_TAGS
+from pipeline.metrics import metrics
+
+_WORD = re.compile(r"[a-z][a-z0-9'-]*")
+_STOPWORDS = frozenset("""
+    the and for with from that this these those which who whom what when where how than then such not can may might
+    will would should could does did has have had into about over under between each other more most some any all
+    both either neither also only very just but because while are was were been being its their there they them
+    you your our his her one two use used using
+""".split())
+
+# Chunk-level signals of front and back matter. Chunks are whitespace-collapsed by the
+# chunker, so single spaces can be matched literally (literal-first patterns scan fastest).
+_DOT_LEADER = re.compile(r"\.(?: ?\.){3,} ?\d{1,4}\b")
+_PAGE_NUMBER = re.compile(r" \d{1,4} (?=[A-Z][a-z])")
+_PAGE_LIST_ITEM = re.compile(r", \d{1,4}(?:[-–]\d{1,4})?(?=[ ,]|$)")
+_SENTENCE_START = re.compile(r"[.!?] [A-Z\"'(]")
+_FRONT_MATTER = ("all rights reserved", "isbn", "table of contents", "printed in")
+# Numbered exercises and data lists look like page references, so those only count under a heading
+_CONTENTS_HEADING = re.compile(r"\b(?:table of )?contents\b", re.IGNORECASE)
+_INDEX_HEADING = re.compile(r"(?:^|[^a-z] )index\b", re.IGNORECASE)
+
+
+def boilerplate_reason(chunk: str):
+    """
+    Returns why a chunk looks like a table of contents, index or front matter (and
+    can't yield a sensible question), or None for ordinary content. Judged by dot
+    leaders, and by page references relative to the number of real sentences when
+    the chunk also carries a contents or index heading.
+    """
+    sentences = len(_SENTENCE_START.findall(chunk)) + 1
+    dot_leaders = len(_DOT_LEADER.findall(chunk))
+    if dot_leaders >= 3 or (_CONTENTS_HEADING.search(chunk) and len(_PAGE_NUMBER.findall(chunk)) >= max(5, 2 * sentences)):
+        return "table of contents"
+    if _INDEX_HEADING.search(chunk) and len(_PAGE_LIST_ITEM.findall(chunk)) >= max(8, 3 * sentences):
+        return "index"
+    lowered = chunk.lower()
+    front_matter = sum(phrase in lowered for phrase in _FRONT_MATTER)
+    if front_matter >= 2 or (front_matter and sentences * 25 < len(chunk.split())):
+        return "front matter"
+    return None
+
+
+@functools.lru_cache(maxsize=65536)
+def _term(word: str):
+    """Normalized term for a lowercased word, or None for stopwords and short words."""
+    word = word.strip("'-")
+    if len(word) < 3 or word in _STOPWORDS:
+        return None
+    # Crude plural folding so "equations" matches "equation"
+    if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    return word
+
+
+def _tokens(text: str) -> list:
+    return [term for term in map(_term, _WORD.findall(text.lower())) if term]
+
+
+def tfidf_matrix(documents: list, max_features: int = 4096, keep_terms: list = ()) -> np.ndarray:
+    """
+    L2-normalized TF-IDF rows (sublinear term frequency, smoothed IDF), built with NumPy
+    from (document, term) coordinates. The vocabulary is the `max_features` most common
+    terms appearing in at least two documents, plus every term of `keep_terms` documents.
+    """
+    vocab, rows, cols = {}, [], []
+    for i, document in enumerate(documents):
+        for token in _tokens(document):
+            rows.append(i)
+            cols.append(vocab.setdefault(token, len(vocab)))
+    n_docs, n_terms = len(documents), len(vocab)
+    if not n_terms:
+        return np.zeros((n_docs, 0), dtype=np.float32)
+
+    pairs, counts = np.unique(np.asarray(rows, dtype=np.int64) * n_terms + np.asarray(cols, dtype=np.int64), return_counts=True)
+    rows, cols = pairs // n_terms, pairs % n_terms
+    df = np.bincount(cols, minlength=n_terms)
+
+    keep = np.zeros(n_terms, dtype=bool)
+    frequent = np.flatnonzero(df >= 2)
+    keep[frequent[np.argsort(-df[frequent], kind="stable")[:max_features]]] = True
+    for document in keep_terms:
+        keep[[vocab[token] for token in _tokens(document) if token in vocab]] = True
+
+    column = np.cumsum(keep) - 1
+    mask = keep[cols]
+    matrix = np.zeros((n_docs, int(keep.sum())), dtype=np.float32)
+    idf = np.log((1 + n_docs) / (1 + df)) + 1
+    matrix[rows[mask], column[cols[mask]]] = np.log1p(counts[mask]) * idf[cols[mask]]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def topic_documents(section: str) -> tuple:
+    """(tags, texts): each of the section's tags with its DETAILED_SYLLABUS description, if any."""
+    descriptions = {}
+    for topic, description in DETAILED_SYLLABUS.get(section, {}).items():
+        for tag in normalize_tags([topic], section):
+            descriptions[tag] = description
+    tags = SECTION_TAGS.get(section, [])
+    return tags, [f"{tag}. {descriptions.get(tag, '')}" for tag in tags]
+
+
+@functools.lru_cache(maxsize=None)
+def bank_tag_counts(section: str, path: str = BANK_SNAPSHOT_PATH) -> tuple:
+    """Questions per tag of `section` in the local bank snapshot (all zeros without one)."""
+    tags = SECTION_TAGS.get(section, [])
+    if not os.path.exists(path):
+        return tuple(0 for _ in tags)
+    from database.snapshot import BankSnapshot
+
+    snapshot = BankSnapshot(path)
+    return tuple(snapshot.count(section, None, tag) for tag in tags)
+
+
+def tag_weights(counts) -> np.ndarray:
+    """Under-represented tags weigh more: sqrt((mean + 1) / (count + 1)), clipped to [0.25, 4]."""
+    counts = np.asarray(counts, dtype=np.float64)
+    if not counts.size or not counts.any():
+        return np.ones(counts.size)
+    return np.clip(np.sqrt((counts.mean() + 1) / (counts + 1)), 0.25, 4.0)
+
+
+def chunk_budget(num_chunks: int):
+    """How many chunks of a source may be sent for generation (None = no limit)."""
+    limits = []
+    if CHUNK_BUDGET > 0:
+        limits.append(CHUNK_BUDGET)
+    if CHUNK_BUDGET_RATIO < 1:
+        limits.append(math.ceil(CHUNK_BUDGET_RATIO * num_chunks))
+    return min(limits) if limits else None
+
+
+def select_chunks(chunks: list, section: str, budget: int = None, done=(), tag_counts=None,
+                  redundancy: float = 0.5, decay: float = 0.5) -> list:
+    """
+    Picks which chunks to generate from, returning their indices in document order.
+    Without a `budget` (default: chunk_budget()) every chunk is kept. Under one,
+    boilerplate (tables of contents, indexes, front matter) is dropped and chunks are
+    chosen greedily by
+
+        max over tags t of  weight[t] * decay ** picked[t] * similarity(chunk, t)
+          - redundancy * max similarity to an already chosen chunk
+
+    with TF-IDF cosine similarities against each tag's syllabus description. Every
+    pick on a tag halves (`decay`) the value of further chunks for it, so the budget
+    spreads across tags; weights favour tags with few questions in the bank snapshot;
+    the redundancy term keeps near-identical chunks out. Chunks in `done` (already
+    generated in an earlier run) are kept and count against the budget.
+    """
+    budget = chunk_budget(len(chunks)) if budget is None else budget
+    if budget is None:
+        metrics.count("chunks.selected", len(chunks))
+        return list(range(len(chunks)))
+
+    done = set(done)
+    candidates = []
+    for i, chunk in enumerate(chunks):
+        reason = None if i in done else boilerplate_reason(chunk)
+        if reason:
+            metrics.count("chunks.boilerplate")
+            print(f"INFO: Skipping chunk {i} ({reason}).")
+        else:
+            candidates.append(i)
+
+    if budget >= len(candidates):
+        metrics.count("chunks.selected", len(candidates))
+        return candidates
+
+    tags, topics = topic_documents(section)
+    matrix = tfidf_matrix([chunks[i] for i in candidates] + topics, keep_terms=topics)
+    vectors, topic_vectors = matrix[:len(candidates)], matrix[len(candidates):]
+    relevance = vectors @ topic_vectors.T
+    weights = tag_weights(bank_tag_counts(section) if tag_counts is None else tag_counts)
+    if not tags:
+        relevance, weights = np.zeros((len(candidates), 1), dtype=np.float32), np.ones(1)
+
+    picked = np.zeros(relevance.shape[1])
+    closest = np.zeros(len(candidates), dtype=np.float32)
+    selected = np.zeros(len(candidates), dtype=bool)
+    credited = {}  # candidate -> the tag it was picked for
+
+    def take(j, tag):
+        selected[j] = True
+        picked[tag] += 1
+        credited[j] = tag
+        np.maximum(closest, vectors @ vectors[j], out=closest)
+
+    for j, i in enumerate(candidates):
+        if i in done:
+            take(j, int((relevance[j] * weights).argmax()))
+    rows = np.arange(len(candidates))
+    for _ in range(max(0, budget - int(selected.sum()))):
+        scores = relevance * (weights * decay ** picked)
+        best_tag = scores.argmax(axis=1)
+        gain = scores[rows, best_tag] - redundancy * closest
+        gain[selected] = -np.inf
+        j = int(gain.argmax())
+        take(j, int(best_tag[j]))
+
+    chosen = [candidates[j] for j in np.flatnonzero(selected)]
+    metrics.count("chunks.selected", len(chosen))
+    metrics.count("chunks.skipped_by_budget", len(candidates) - len(chosen))
+    covered = len({tag for j, tag in credited.items() if relevance[j, tag] > 0}) if tags else 0
+    print(f"INFO: Selected {len(chosen)} of {len(chunks)} chunks covering {covered}/{len(tags)} {section} tags.")
+    return chosen
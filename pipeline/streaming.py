@@ -0,0 +1,214 @@
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from config.settings import DIFFICULTIES, MAX_CONCURRENCY, STREAM_QUEUE_SIZE, DEDUP_INDEX_PATH, DEDUP_THRESHOLD
+from pipeline.checkpoint import chunk_key, manifest_for
+from pipeline.dedup import DuplicateIndex
+from pipeline.ingest import chunk_pdf
+from pipeline.metrics import metrics
+from pipeline.pipeline import generate_mcqs_multi, fill_missing_tags
+from pipeline.selection import select_chunks
+
+# Marks the end of a stage's input; each worker passes it on to its siblings before exiting
+_DONE = object()
+
+
+class Stage:
+    """
+    One step of a streaming pipeline: `fn(item)` returns an iterable of output items
+    (return [] to drop an item). `workers` threads run it concurrently.
+    """
+
+    def __init__(self, name: str, fn, workers: int = 1):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.lock = threading.Lock()
+
+
+class StreamingPipeline:
+    """
+    Runs stages connected by bounded queues. A full queue blocks its producer
+    (backpressure), so fast stages can't run ahead of slow ones and memory stays
+    bounded, while network-bound stages overlap with each other. Errors are
+    per item: the item is logged and dropped and the rest keep flowing. Ctrl-C
+    stops intake, lets workers exit at their next item boundary and is then
+    re-raised to the caller.
+    """
+
+    def __init__(self, stages: list, queue_size: int = STREAM_QUEUE_SIZE):
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+        self.stop = threading.Event()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Blocking put that gives up once the pipeline is stopping."""
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _worker(self, stage: Stage, inbox: queue.Queue, outbox: queue.Queue, remaining: list, lock: threading.Lock):
+        while True:
+            item = self._get(inbox)
+            if item is _DONE:
+                self._put(inbox, _DONE)  # let sibling workers see it too
+                break
+            started = time.perf_counter()
+            failed = False
+            try:
+                for output in stage.fn(item):
+                    if not self._put(outbox, output):
+                        break
+            except Exception as e:
+                failed = True
+                print(f"ERROR: Stage '{stage.name}' failed on an item: {e}")
+            metrics.observe(f"stage.{stage.name}", time.perf_counter() - started)
+            with stage.lock:
+                stage.processed += 1
+                stage.failed += failed
+                stage.busy_seconds += time.perf_counter() - started
+
+        # The last worker of a stage closes the next stage's input
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                self._put(outbox, _DONE)
+
+    def run(self, inputs) -> list:
+        """Feeds `inputs` through every stage and returns the final stage's outputs."""
+        threads = []
+        for stage, inbox, outbox in zip(self.stages, self.queues, self.queues[1:]):
+            remaining, lock = [stage.workers], threading.Lock()
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker, args=(stage, inbox, outbox, remaining, lock),
+                    name=f"{stage.name}-{n}", daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        def feed():
+            for item in inputs:
+                if not self._put(self.queues[0], item):
+                    return
+            self._put(self.queues[0], _DONE)
+
+        feeder = threading.Thread(target=feed, name="feeder", daemon=True)
+        feeder.start()
+
+        outputs = []
+        try:
+            while True:
+                item = self._get(self.queues[-1])
+                if item is _DONE:
+                    break
+                outputs.append(item)
+        except KeyboardInterrupt:
+            print("WARNING: Interrupted; stopping pipeline after in-flight items.")
+            raise
+        finally:
+            self.stop.set()
+            for thread in threads:
+                thread.join(timeout=5)
+            for stage in self.stages:
+                print(f"INFO: Stage '{stage.name}' ({stage.workers} workers): {stage.processed} items, {stage.failed} failed, {stage.busy_seconds:.1f}s busy")
+        return outputs
+
+
+def run_streaming(sources: list, section: str, num_questions: int = 1, extract_workers: int = 2,
+                  generate_workers: int = MAX_CONCURRENCY, tag_workers: int = 2, upload_workers: int = 2) -> int:
+    """
+    End-to-end streaming run over PDF paths: extract+chunk -> generate -> tag -> validate -> upload.
+    Extraction and chunking share a stage because a source's pages must be chunked in
+    order; PDF parsing holds the GIL, so each source is chunked in one of `extract_workers`
+    processes and several sources run in parallel. Chunks go through select_chunks() as
+    in non-streaming runs, and units recorded in a source's run manifest are skipped.
+    Returns the number of questions uploaded.
+    """
+    from database.storage import upload_questions
+
+    dedup_index = DuplicateIndex.load_or_create(DEDUP_INDEX_PATH)
+    reserved = DuplicateIndex()
+    dedup_lock = threading.Lock()
+    extractor = ProcessPoolExecutor(max_workers=extract_workers)
+
+    def extract_and_chunk(source):
+        chunks = extractor.submit(chunk_pdf, source).result()
+        manifest = manifest_for(source, section)
+        keys = [chunk_key(chunk) for chunk in chunks]
+        # Chunks started by an earlier run stay selected so their remaining difficulties get finished
+        started = [i for i, key in enumerate(keys) if any(manifest.is_done(source, key, d) for d in DIFFICULTIES)]
+        for i in select_chunks(chunks, section, done=started):
+            remaining = [d for d in DIFFICULTIES if not manifest.is_done(source, keys[i], d)]
+            if remaining:
+                yield {"source": source, "manifest": manifest, "chunk_key": keys[i], "chunk": chunks[i], "difficulties": remaining}
+
+    def generate(unit):
+        unit["questions"] = generate_mcqs_multi(unit["chunk"], [section], unit["difficulties"], num_questions, tag_missing=False)
+        # Difficulties the reply had no usable questions for stay pending for the next run
+        unit["produced"] = {q.difficulty for q in unit["questions"]}
+        return [unit]
+
+    def tag(unit):
+        fill_missing_tags(unit["questions"])
+        return [unit]
+
+    def validate(unit):
+        # Questions carry their IDs already, so units in flight reserve them in a per-run index
+        # (never saved). The persistent index only learns a question once its upload succeeded.
+        with dedup_lock:
+            questions = dedup_index.filter_new(unit["questions"], DEDUP_THRESHOLD)
+            unit["questions"] = reserved.filter_new(questions, DEDUP_THRESHOLD)
+            reserved.add_many([q.question_id for q in unit["questions"]], unit["questions"])
+        return [unit]
+
+    def upload(unit):
+        try:
+            question_ids = upload_questions(unit["questions"]) if unit["questions"] else []
+        except Exception:
+            with dedup_lock:
+                reserved.discard([q.question_id for q in unit["questions"]])
+            raise
+        with dedup_lock:
+            dedup_index.add_many(question_ids, unit["questions"])
+        for difficulty in unit["difficulties"]:
+            if difficulty not in unit["produced"]:
+                continue
+            ids = [qid for q, qid in zip(unit["questions"], question_ids) if q.difficulty == difficulty]
+            unit["manifest"].mark_done(unit["source"], unit["chunk_key"], difficulty, ids)
+        return [len(question_ids)]
+
+    pipeline = StreamingPipeline([
+        Stage("extract+chunk", extract_and_chunk, workers=extract_workers),
+        Stage("generate", generate, workers=generate_workers),
+        Stage("tag", tag, workers=tag_workers),
+        Stage("validate", validate, workers=1),
+        Stage("upload", upload, workers=upload_workers),
+    ])
+    try:
+        uploaded = sum(pipeline.run(sources))
+    finally:
+        extractor.shutdown(wait=False, cancel_futures=True)
+        # After an interrupt, upload workers still finishing an item may be adding to the index
+        with dedup_lock:
+            dedup_index.save(DEDUP_INDEX_PATH)
+    print(f"INFO: Streaming run uploaded {uploaded} questions from {len(sources)} source(s).")
+    return uploaded
+
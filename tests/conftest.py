@@ -0,0 +1,95 @@
+"""
+Shared fixtures: every test gets its own checkpoint directory, dedup index and local
+SQLite bank, with the response cache disabled, a fresh rate limiter and the OpenAI
+client replaced by the benchmark suite's fake, so nothing touches the network or the
+working tree.
+"""
+import json
+import types
+
+import fitz
+import pytest
+
+import config.settings
+import pipeline.checkpoint
+import pipeline.pipeline
+import pipeline.streaming
+import database.storage
+from benchmarks.fakes import FakeChatCompletions
+from database.local import SQLiteBackend
+from pipeline.rate_limit import RateLimiter
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline.checkpoint, "CHECKPOINT_DIR", str(tmp_path / "checkpoints"))
+    monkeypatch.setattr(config.settings, "DEDUP_INDEX_PATH", str(tmp_path / "dedup_index.npz"))
+    monkeypatch.setattr(pipeline.streaming, "DEDUP_INDEX_PATH", str(tmp_path / "dedup_index.npz"))
+    monkeypatch.setattr(pipeline.pipeline, "RESPONSE_CACHE_PATH", "")
+    monkeypatch.setattr(pipeline.pipeline, "_rate_limiter", RateLimiter(requests_per_minute=10**6, tokens_per_minute=10**9))
+    return tmp_path
+
+
+@pytest.fixture
+def bank(tmp_path, monkeypatch):
+    """The local bank every upload in the test goes to."""
+    backend = SQLiteBackend(str(tmp_path / "bank.sqlite"))
+    monkeypatch.setattr(database.storage, "_backend", backend)
+    yield backend
+    backend.close()
+
+
+class ScriptedChat(FakeChatCompletions):
+    """The fake client, except that generation calls answer with `reply` while it is set."""
+
+    def __init__(self):
+        super().__init__(latency=0)
+        self.reply = None
+
+    def create(self, model: str, messages: list, **kwargs):
+        if self.reply is None or "### Your Task" not in self._text(messages):
+            return super().create(model, messages, **kwargs)
+        with self._lock:
+            self.calls += 1
+        message = types.SimpleNamespace(content=self.reply)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    chat = ScriptedChat()
+    monkeypatch.setattr(pipeline.pipeline, "openai", types.SimpleNamespace(chat=types.SimpleNamespace(completions=chat)))
+    return chat
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """Writes a PDF with one paragraph of distinct sentences per page and returns its path."""
+    def make(name: str = "book.pdf", pages: int = 3, sentences: int = 40) -> str:
+        path = str(tmp_path / name)
+        doc = fitz.open()
+        for n in range(pages):
+            text = " ".join(f"Page {n} sentence {i} explains how the slope of line {i} changes." for i in range(sentences))
+            doc.new_page().insert_textbox(fitz.Rect(72, 72, 540, 770), text, fontsize=8)
+        doc.save(path)
+        doc.close()
+        return path
+    return make
+
+
+def model_question(section: str = "math", difficulty: str = "easy", text: str = "What is the slope of y = 2x + 1?", **fields) -> dict:
+    """One question as the model returns it."""
+    question = {
+        "section": section,
+        "difficulty": difficulty,
+        "question_text": text,
+        "options": {"A": "1", "B": "2", "C": "3", "D": "4"},
+        "correct": "B",
+        "tags": ["Linear Equations and Inequalities"],
+    }
+    question.update(fields)
+    return question
+
+
+def model_reply(*questions) -> str:
+    return json.dumps({"questions": list(questions)})
@@ -0,0 +1,117 @@
+import argparse
+import json
+
+import pytest
+
+from config.settings import DIFFICULTIES
+from pipeline import batch
+from pipeline.checkpoint import chunk_key, manifest_for
+from tests.conftest import model_question, model_reply
+
+
+def ok(custom_id: str, content: str) -> dict:
+    body = {"model": "gpt-4o", "choices": [{"message": {"content": content}}], "usage": {"prompt_tokens": 100, "completion_tokens": 50}}
+    return {"custom_id": custom_id, "response": {"status_code": 200, "body": body}}
+
+
+def write_results(path, lines: list) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(line) + "\n" for line in lines)
+    return str(path)
+
+
+@pytest.fixture
+def requests_path(tmp_path):
+    """Four single-difficulty requests over two chunks of one source."""
+    jobs = [
+        {"custom_id": f"req-{n}", "source": "book.pdf", "chunk_index": n // 2, "chunk": f"Chunk {n // 2} about slopes.",
+         "sections": ["math"], "difficulties": [difficulty]}
+        for n, difficulty in enumerate(["easy", "hard", "easy", "hard"])
+    ]
+    path = str(tmp_path / "batch" / "math.jsonl")
+    batch.write_batch_requests(jobs, path)
+    return path
+
+
+def ingest_args(requests_path: str, results_path: str, dry_run: bool = False) -> argparse.Namespace:
+    return argparse.Namespace(requests=requests_path, results=results_path, offline=True, dry_run=dry_run)
+
+
+def test_prepare_writes_one_request_per_chunk(make_pdf, tmp_path):
+    out = str(tmp_path / "math.jsonl")
+    batch._prepare(argparse.Namespace(source=make_pdf(pages=2), section="math", num_questions=2, per_difficulty=False, out=out))
+
+    with open(out, encoding="utf-8") as f:
+        requests = [json.loads(line) for line in f]
+    with open(out + ".meta", encoding="utf-8") as f:
+        metas = [json.loads(line) for line in f]
+    assert requests and len(requests) == len(metas)
+    assert {r["url"] for r in requests} == {batch.BATCH_ENDPOINT}
+    assert all(meta["difficulties"] == DIFFICULTIES and meta["num_questions"] == 2 for meta in metas)
+    assert [r["custom_id"] for r in requests] == [m["custom_id"] for m in metas]
+
+
+def test_ingest_sorts_results_into_questions_and_failures(requests_path, tmp_path):
+    results = write_results(tmp_path / "results.jsonl", [
+        ok("req-0", model_reply(model_question(difficulty="easy"))),
+        {"custom_id": "req-1", "error": {"code": "server_error"}},
+        ok("req-2", "this is not JSON"),
+        ok("unknown", model_reply(model_question())),
+        # req-3 has no result line
+    ])
+
+    questions_by_id, failed_ids = batch.ingest_batch_results(requests_path, results, tag_missing=False)
+
+    assert list(questions_by_id) == ["req-0"]
+    assert questions_by_id["req-0"][0].difficulty == "easy"
+    assert sorted(failed_ids) == ["req-1", "req-2", "req-3"]
+
+
+def test_result_without_usable_questions_is_a_failure(requests_path, tmp_path):
+    results = write_results(tmp_path / "results.jsonl", [ok("req-0", model_reply(model_question(correct="Z")))])
+
+    questions_by_id, failed_ids = batch.ingest_batch_results(requests_path, results, tag_missing=False)
+
+    assert questions_by_id == {}
+    assert "req-0" in failed_ids
+
+
+def test_retry_file_holds_only_failed_requests(requests_path):
+    retry_path = batch.write_retry_requests(requests_path, ["req-1", "req-3"])
+
+    with open(retry_path, encoding="utf-8") as f:
+        requests = [json.loads(line) for line in f]
+    with open(retry_path + ".meta", encoding="utf-8") as f:
+        metas = [json.loads(line) for line in f]
+    assert [r["custom_id"] for r in requests] == ["req-1", "req-3"]
+    assert [m["difficulties"] for m in metas] == [["hard"], ["hard"]]
+
+
+def test_ingest_uploads_checkpoints_and_is_idempotent(requests_path, tmp_path, bank):
+    results = write_results(tmp_path / "results.jsonl", [
+        ok("req-0", model_reply(model_question(difficulty="easy", text="What is the slope of y = 3x + 2 on the plane?"))),
+        ok("req-1", "garbage"),
+        ok("req-2", model_reply(model_question(difficulty="easy", text="Which expression is equivalent to 4(x + 2) - x?"))),
+    ])
+
+    batch._ingest(ingest_args(requests_path, results))
+
+    assert len(list(bank.iter_quiz_questions())) == 2
+    manifest = manifest_for("book.pdf", "math")
+    assert manifest.is_done("book.pdf", chunk_key("Chunk 0 about slopes."), "easy")
+    assert not manifest.is_done("book.pdf", chunk_key("Chunk 0 about slopes."), "hard")
+    with open(tmp_path / "batch" / "math.retry.jsonl", encoding="utf-8") as f:
+        assert sorted(json.loads(line)["custom_id"] for line in f) == ["req-1", "req-3"]
+
+    # Ingesting the same results again uploads nothing new
+    batch._ingest(ingest_args(requests_path, results))
+    assert len(list(bank.iter_quiz_questions())) == 2
+
+
+def test_dry_run_uploads_nothing(requests_path, tmp_path, bank):
+    results = write_results(tmp_path / "results.jsonl", [ok("req-0", model_reply(model_question(difficulty="easy")))])
+
+    batch._ingest(ingest_args(requests_path, results, dry_run=True))
+
+    assert list(bank.iter_quiz_questions()) == []
+    assert len(manifest_for("book.pdf", "math")) == 0
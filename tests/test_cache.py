@@ -0,0 +1,42 @@
+import pytest
+
+from pipeline.cache import ResponseCache, cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), max_bytes=1000)
+    yield cache
+    cache.close()
+
+
+def test_key_covers_every_part_of_the_request():
+    base = {"model": "gpt-4o", "messages": [{"role": "user", "content": "chunk"}], "temperature": 0.5}
+
+    assert cache_key(**base) == cache_key(**dict(reversed(list(base.items()))))
+    assert cache_key(**base) != cache_key(**{**base, "temperature": 0})
+    assert cache_key(**base) != cache_key(**{**base, "messages": [{"role": "user", "content": "other chunk"}]})
+
+
+def test_values_survive_reopening(tmp_path, cache):
+    cache.set("k", '{"questions": []}')
+    cache.close()
+
+    reopened = ResponseCache(cache.path)
+    assert reopened.get("k") == '{"questions": []}'
+    assert reopened.get("missing") is None
+    reopened.close()
+
+
+def test_eviction_drops_least_recently_used_entries_below_the_limit(cache, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr("pipeline.cache.time.time", lambda: next(clock))
+    for key in "abc":
+        cache.set(key, key * 300)
+    cache.get("a")  # b is now the least recently used
+
+    cache.set("d", "d" * 300)
+
+    assert cache.total_bytes() <= 900
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acd")
@@ -0,0 +1,28 @@
+from pipeline.checkpoint import RunManifest, chunk_key
+
+
+def test_done_units_are_reloaded_with_their_question_ids(tmp_path):
+    path = str(tmp_path / "run" / "book.math.jsonl")
+    manifest = RunManifest(path)
+    manifest.mark_done("book.pdf", chunk_key("chunk one"), "easy", ["q1", "q2"])
+
+    reloaded = RunManifest(path)
+
+    assert len(reloaded) == 1
+    assert reloaded.is_done("book.pdf", chunk_key("chunk one"), "easy")
+    assert not reloaded.is_done("book.pdf", chunk_key("chunk one"), "hard")
+    assert reloaded.done[("book.pdf", chunk_key("chunk one"), "easy")] == ["q1", "q2"]
+
+
+def test_a_torn_last_line_is_ignored(tmp_path):
+    path = str(tmp_path / "book.math.jsonl")
+    RunManifest(path).mark_done("book.pdf", chunk_key("chunk"), "easy")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"source": "book.pdf", "chu')
+
+    assert len(RunManifest(path)) == 1
+
+
+def test_chunks_are_keyed_by_content_not_position():
+    assert chunk_key("same text") == chunk_key("same text")
+    assert chunk_key("same text") != chunk_key("other text")
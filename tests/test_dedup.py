@@ -0,0 +1,90 @@
+from Question import Question
+from pipeline.dedup import DuplicateIndex
+from tests.conftest import model_question
+
+IMAGE_A = "https://storage.example/bucket/images/" + "a" * 64 + ".png"
+IMAGE_B = "https://storage.example/bucket/images/" + "b" * 64 + ".png"
+
+STEM = "A line passes through the points (0, 1) and (2, 5) in the xy-plane. What is the slope of the line?"
+
+
+def question(text: str = STEM, **fields) -> Question:
+    return Question.from_model_output(model_question(text=text, **fields))[0]
+
+
+def test_query_finds_near_duplicate_and_ignores_unrelated():
+    original = question()
+    index = DuplicateIndex.from_questions([original])
+
+    match, similarity = index.query(question(STEM.replace("What is", "What's")))
+    assert match == original.question_id
+    assert similarity >= 0.5
+    assert index.query(question("Which word best describes the narrator's tone in the passage?")) == (None, 0.0)
+
+
+def test_check_batch_reports_index_and_in_batch_duplicates():
+    existing = question()
+    index = DuplicateIndex.from_questions([existing])
+    fresh = "Which word best describes the narrator's tone in the passage about the storm?"
+
+    results = index.check_batch([question(STEM), question(fresh), question(fresh)], threshold=0.8)
+
+    assert results[0][0] == existing.question_id
+    assert results[1] == (None, 0.0)
+    assert results[2][0] == "batch:1"
+    assert len(index) == 1  # checking doesn't modify the index
+
+
+def test_filter_new_drops_or_flags_duplicates():
+    existing = question()
+    index = DuplicateIndex.from_questions([existing])
+
+    novel = question("A brand new question about circles and their radii?")
+    assert index.filter_new([question(), novel]) == [novel]
+    flagged = index.filter_new([question()], flag_only=True)
+    assert flagged[0].duplicate_of == existing.question_id
+
+
+def test_save_and_load_round_trip(tmp_path):
+    questions = [question(f"Question {i} asks for the value of x when {i}x + 3 = {i + 10}?") for i in range(50)]
+    index = DuplicateIndex.from_questions(questions)
+    path = str(tmp_path / "index" / "dedup.npz")
+
+    index.save(path)
+    loaded = DuplicateIndex.load(path)
+
+    assert loaded.ids == index.ids
+    assert loaded.query(questions[7]) == (questions[7].question_id, 1.0)
+    assert len(DuplicateIndex.load_or_create(str(tmp_path / "missing.npz"))) == 0
+
+
+def test_alternating_adds_and_queries_past_the_initial_capacity():
+    index = DuplicateIndex()
+    questions = [question(f"Unit {i}: solve for y when y = {i}x and x equals {i * 3} exactly?") for i in range(1500)]
+
+    for q in questions:
+        assert index.filter_new([q], threshold=0.95) == [q]
+        index.add(q.question_id, q)
+
+    assert len(index) == 1500
+    assert index.query(questions[0]) == (questions[0].question_id, 1.0)
+    assert index.query(questions[-1]) == (questions[-1].question_id, 1.0)
+
+
+def test_questions_about_different_images_are_not_duplicates():
+    index = DuplicateIndex.from_questions([question("What does the graph show?", image_url=IMAGE_A)])
+
+    assert index.query(question("What does the graph show?", image_url=IMAGE_B)) == (None, 0.0)
+    assert index.query(question("What does the graph show?", image_url=IMAGE_A))[1] == 1.0
+    # The same image under another URL is still recognized by its content hash
+    assert index.query(question("What does the graph show?", image_url="https://cdn.example/images/" + "a" * 64 + ".png"))[1] == 1.0
+
+
+def test_discarded_questions_no_longer_match():
+    kept, dropped = question(), question("Which word best describes the narrator's tone in the passage?")
+    index = DuplicateIndex.from_questions([kept, dropped])
+
+    index.discard([dropped.question_id])
+
+    assert index.query(dropped) == (None, 0.0)
+    assert index.query(kept) == (kept.question_id, 1.0)
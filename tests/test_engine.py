@@ -0,0 +1,32 @@
+import time
+
+from pipeline.engine import run_ordered
+
+
+def test_results_come_back_in_job_order():
+    def slow_square(x):
+        time.sleep(0.01 * (5 - x))  # later jobs finish first
+        return x * x
+
+    assert run_ordered(slow_square, [{"x": x} for x in range(5)], max_workers=5) == [0, 1, 4, 9, 16]
+
+
+def test_failed_job_yields_the_default():
+    def invert(x):
+        return 1 / x
+
+    assert run_ordered(invert, [{"x": 1}, {"x": 0}, {"x": 4}], max_workers=2, default=[]) == [1.0, [], 0.25]
+
+
+def test_a_failing_result_handler_does_not_stop_the_other_jobs():
+    handled = []
+
+    def on_result(i, result):
+        if i == 1:
+            raise RuntimeError("upload failed")
+        handled.append(i)
+
+    results = run_ordered(lambda x: x, [{"x": x} for x in range(4)], max_workers=1, on_result=on_result)
+
+    assert results == [0, 1, 2, 3]
+    assert sorted(handled) == [0, 2, 3]
@@ -0,0 +1,85 @@
+import json
+import os
+
+import fitz
+import numpy as np
+import pytest
+
+from pipeline.figures import _as_vision_image, _gray_pixels, difference_hash, extract_figures, image_entropy
+
+
+def png(width: int, height: int, seed: int = None, fill: int = 200) -> bytes:
+    """A grayscale PNG: random noise for a given seed, otherwise a flat fill."""
+    if seed is None:
+        samples = np.full((height, width), fill, dtype=np.uint8)
+    else:
+        samples = np.random.default_rng(seed).integers(0, 256, size=(height, width), dtype=np.uint8)
+    return fitz.Pixmap(fitz.csGRAY, width, height, samples.tobytes(), 0).tobytes("png")
+
+
+@pytest.fixture
+def pdf_with_images(tmp_path):
+    """Writes a PDF whose pages carry the given images and returns its path."""
+    def make(pages: list) -> str:
+        path = str(tmp_path / "figures.pdf")
+        doc = fitz.open()
+        for images in pages:
+            page = doc.new_page()
+            page.insert_text((72, 60), "Figure 1 shows the graph of f(x) = x^2.")
+            for n, image in enumerate(images):
+                page.insert_image(fitz.Rect(72, 80 + 220 * n, 272, 280 + 220 * n), stream=image)
+        doc.save(path)
+        doc.close()
+        return path
+    return make
+
+
+def test_small_and_flat_images_are_dropped(pdf_with_images, tmp_path):
+    path = pdf_with_images([[png(200, 200, seed=1), png(40, 40, seed=2), png(200, 200)]])
+
+    figures = extract_figures(path, str(tmp_path / "out"), max_workers=1)
+
+    assert [figure["page"] for figure in figures] == [1]
+    assert "f(x) = x^2" in figures[0]["context"]
+
+
+def test_repeated_images_are_kept_once_and_logos_dropped(pdf_with_images, tmp_path):
+    figure, logo = png(200, 200, seed=1), png(150, 150, seed=3)
+    path = pdf_with_images([[figure, logo], [figure, logo], [logo], [png(200, 200, seed=4)]])
+
+    figures = extract_figures(path, str(tmp_path / "out"), max_repeats=2, max_workers=2)
+
+    assert [figure["page"] for figure in figures] == [1, 4]
+    assert len({figure["sha256"] for figure in figures}) == 2
+    with open(tmp_path / "out" / "manifest.json", encoding="utf-8") as f:
+        assert json.load(f) == figures
+    assert all(os.path.exists(figure["path"]) for figure in figures)
+
+
+def test_alpha_is_dropped_before_measuring_entropy():
+    # A flat red RGBA image; with alpha kept, 255s would interleave with the gray samples
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 64, 64), 1)
+    pix.set_rect(pix.irect, (255, 0, 0, 255))
+
+    gray = _gray_pixels(pix)
+
+    assert gray.shape == (64, 64)
+    assert image_entropy(gray) == 0.0
+
+
+def test_difference_hash_ignores_scaling():
+    gray = np.random.default_rng(5).integers(0, 256, size=(64, 64), dtype=np.uint8)
+    doubled = gray.repeat(2, axis=0).repeat(2, axis=1)
+
+    assert difference_hash(gray) == difference_hash(doubled)
+
+
+def test_unsupported_formats_are_converted_to_png():
+    pix = fitz.Pixmap(fitz.csCMYK, fitz.IRect(0, 0, 16, 16), 0)
+    pix.clear_with(128)
+
+    ext, image = _as_vision_image({"ext": "jpx", "image": b"..."}, pix)
+
+    assert ext == "png"
+    assert image.startswith(b"\x89PNG")
+    assert _as_vision_image({"ext": "jpeg", "image": b"jpeg bytes"}, pix) == ("jpeg", b"jpeg bytes")
@@ -0,0 +1,91 @@
+import importlib
+import sys
+import types
+
+import pytest
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, ref, data):
+        self.writes.append((ref, data))
+
+    def commit(self):
+        self.client.committed.append(self.writes)
+
+
+class FakeClient:
+    def __init__(self):
+        self.committed = []
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def collection(self, path):
+        return types.SimpleNamespace(document=lambda document_id: (path, document_id))
+
+
+@pytest.fixture
+def firebase(monkeypatch):
+    """database.firebase imported against an in-memory stand-in for google.cloud.firestore."""
+    firestore = types.ModuleType("google.cloud.firestore")
+    firestore.Client = FakeClient
+    firestore.SERVER_TIMESTAMP = object()
+    cloud = types.ModuleType("google.cloud")
+    cloud.firestore = firestore
+    google = types.ModuleType("google")
+    google.cloud = cloud
+    monkeypatch.setitem(sys.modules, "google", google)
+    monkeypatch.setitem(sys.modules, "google.cloud", cloud)
+    monkeypatch.setitem(sys.modules, "google.cloud.firestore", firestore)
+    monkeypatch.delitem(sys.modules, "database.firebase", raising=False)
+    module = importlib.import_module("database.firebase")
+    yield module
+    sys.modules.pop("database.firebase", None)
+
+
+def question(tags):
+    return {"question_text": "Q?", "options": {"A": "1", "B": "2"}, "correct": "A",
+            "difficulty": "easy", "section": "math", "tags": tags}
+
+
+def test_batches_stay_under_the_write_limit_without_splitting_a_question(firebase):
+    # 3 writes per question (2 tags + quiz_questions): 166 questions fit in a batch, 167 do not
+    client = FakeClient()
+    ids = firebase.FirestoreBackend(client=client).upload_questions([question(["Algebra", "Linear Equations"]) for _ in range(400)])
+
+    batches = client.committed
+    assert len(ids) == len(set(ids)) == 400
+    assert [len(b) for b in batches] == [498, 498, 204]
+    for writes in batches:
+        quiz_ids = {document_id for (path, document_id), _ in writes if path == "quiz_questions"}
+        index_ids = {data["question_id"] for (path, _), data in writes if path != "quiz_questions"}
+        assert index_ids == quiz_ids
+
+
+def test_each_question_is_written_once_to_quiz_questions(firebase):
+    tags = ["Data Analysis / Statistics"]
+    client = FakeClient()
+    (question_id,) = firebase.FirestoreBackend(client=client).upload_questions([question(tags)])
+
+    (writes,) = client.committed
+    paths = [path for (path, _), _ in writes]
+    assert paths == ["SAT/math/easy/Data-Analysis-_-Statistics/questions", "quiz_questions"]
+    assert writes[1][1]["question_id"] == question_id
+    assert writes[1][1]["updated_at"] is firebase.firestore.SERVER_TIMESTAMP
+    assert tags == ["Data Analysis / Statistics"]
+
+
+def test_importing_needs_no_credentials(firebase, monkeypatch):
+    created = []
+    monkeypatch.setattr(firebase.firestore, "Client", lambda: created.append(1) or FakeClient())
+    monkeypatch.setattr(firebase, "_client", None)
+
+    backend = firebase.FirestoreBackend()
+    assert created == []
+
+    assert backend.client is backend.client
+    assert created == [1]
@@ -0,0 +1,67 @@
+from pipeline.ingest import chunk_pdf, count_tokens, iter_chunks
+
+
+def sentences(n: int, start: int = 0) -> list:
+    return [f"Sentence number {i} talks about linear functions." for i in range(start, start + n)]
+
+
+def test_chunks_respect_token_budget_and_keep_sentences_whole():
+    text = " ".join(sentences(60))
+    chunks = list(iter_chunks([text], max_tokens=60, overlap_tokens=0))
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 60 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+    assert " ".join(chunks) == text
+
+
+def test_consecutive_chunks_overlap_by_trailing_sentences():
+    chunks = list(iter_chunks([" ".join(sentences(60))], max_tokens=60, overlap_tokens=15))
+
+    for previous, current in zip(chunks, chunks[1:]):
+        last_sentence = previous.rsplit(". ", 1)[-1]
+        assert current.startswith(last_sentence)
+
+
+def test_final_chunk_is_not_only_overlap():
+    chunks = list(iter_chunks([" ".join(sentences(12))], max_tokens=60, overlap_tokens=15))
+
+    assert chunks[-1] != chunks[-2].rsplit(". ", 1)[-1]
+
+
+def test_sentence_spanning_a_page_break_stays_whole():
+    pages = ["Intro sentence one. The slope of a line", " is rise over run. Next sentence here."]
+    chunks = list(iter_chunks(pages, max_tokens=500))
+
+    assert chunks == ["Intro sentence one. The slope of a line is rise over run. Next sentence here."]
+
+
+def test_chunk_closes_early_at_a_paragraph_break():
+    first, second = " ".join(sentences(9)), " ".join(sentences(3, start=9))
+    chunks = list(iter_chunks([first + "\n\n" + second], max_tokens=130, overlap_tokens=0))
+
+    assert chunks == [first, second]
+
+
+def test_over_budget_sentence_is_split_at_whitespace():
+    long_sentence = " ".join(f"x{i}" for i in range(400)) + "."
+    chunks = list(iter_chunks([long_sentence], max_tokens=50, overlap_tokens=0))
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+    assert " ".join(chunks) == long_sentence
+
+
+def test_pages_without_sentence_ends_are_not_carried_forever():
+    pages = [" ".join(f"{n}x{i}" for i in range(200)) for n in range(50)]
+    chunks = list(iter_chunks(pages, max_tokens=100, overlap_tokens=0))
+
+    assert all(count_tokens(chunk) <= 100 for chunk in chunks)
+    assert " ".join(chunks).split() == " ".join(pages).split()
+
+
+def test_chunk_pdf_reads_every_page(make_pdf):
+    chunks = chunk_pdf(make_pdf(pages=3, sentences=10), max_tokens=100, overlap_tokens=0)
+    text = " ".join(chunks)
+
+    assert all(f"Page {n} sentence 9 " in text for n in range(3))
@@ -0,0 +1,60 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from pipeline.metrics import Metrics
+
+
+def usage(prompt, completion, cached=0):
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion,
+                           prompt_tokens_details=SimpleNamespace(cached_tokens=cached))
+
+
+def test_cost_bills_cached_prompt_tokens_at_the_cached_rate():
+    metrics = Metrics()
+    metrics.record_usage("gpt-4o", usage(1_000_000, 100_000, cached=400_000))
+    metrics.record_usage("gpt-4o", usage(0, 0))
+
+    totals = metrics.summary()["llm_usage"]["gpt-4o"]
+
+    assert totals["calls"] == 2
+    assert totals["cached_prompt_tokens"] == 400_000
+    # 600k uncached at $2.50/M + 400k cached at $1.25/M + 100k output at $10/M
+    assert totals["estimated_cost_usd"] == pytest.approx(1.5 + 0.5 + 1.0)
+
+
+def test_dated_model_names_use_the_longest_matching_price():
+    metrics = Metrics()
+    metrics.record_usage("gpt-4o-mini-2024-07-18", usage(1_000_000, 1_000_000))
+
+    assert metrics.summary()["estimated_cost_usd"] == pytest.approx(0.15 + 0.60)
+
+
+def test_batch_usage_from_a_results_file_is_discounted():
+    metrics = Metrics()
+    metrics.record_usage("batch:gpt-4o", {"prompt_tokens": 1_000_000, "completion_tokens": 0,
+                                          "prompt_tokens_details": {"cached_tokens": 0}})
+    metrics.record_usage("unknown-model", usage(1_000_000, 1_000_000))
+
+    summary = metrics.summary()
+    assert summary["llm_usage"]["batch:gpt-4o"]["estimated_cost_usd"] == pytest.approx(1.25)
+    assert summary["llm_usage"]["unknown-model"]["estimated_cost_usd"] == 0.0
+    assert summary["estimated_cost_usd"] == pytest.approx(1.25)
+
+
+def test_export_reports_stages_counters_and_cost_per_question(tmp_path):
+    metrics = Metrics()
+    for seconds in (0.001, 0.2, 3.0):
+        metrics.observe("stage.generate", seconds)
+    metrics.count("questions.uploaded", 4)
+    metrics.record_usage("gpt-4o", usage(0, 100_000))
+
+    summary = metrics.export_json(str(tmp_path / "out" / "metrics.json"))
+
+    assert json.loads((tmp_path / "out" / "metrics.json").read_text()) == summary
+    stage = summary["stages"]["stage.generate"]
+    assert stage["count"] == 3 and stage["max_s"] == 3.0
+    assert stage["histogram"]["le_0.005"] == stage["histogram"]["le_0.25"] == stage["histogram"]["le_5"] == 1
+    assert summary["counters"] == {"questions.uploaded": 4}
+    assert summary["estimated_cost_per_question_usd"] == pytest.approx(0.25)
@@ -0,0 +1,89 @@
+import json
+import types
+
+import pipeline.pipeline
+
+
+class RecordingLimiter:
+    def __init__(self):
+        self.acquired = []
+
+    def acquire(self, num_tokens: int):
+        self.acquired.append(num_tokens)
+
+
+def reply(content: str):
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=content))], usage=None)
+
+
+def test_every_retry_goes_through_the_rate_limiter(monkeypatch):
+    limiter = RecordingLimiter()
+    attempts = []
+
+    def create(**kwargs):
+        attempts.append(kwargs)
+        if len(attempts) == 1:
+            error = RuntimeError("rate limited")
+            error.status_code = 429
+            raise error
+        return reply('{"tags": []}')
+
+    monkeypatch.setattr(pipeline.pipeline, "_rate_limiter", limiter)
+    monkeypatch.setattr(pipeline.pipeline, "openai", types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create))))
+    monkeypatch.setattr("pipeline.rate_limit.time.sleep", lambda seconds: None)
+
+    pipeline.pipeline._chat_completion(completion_tokens=10, model="gpt-4o-mini", messages=[{"role": "user", "content": "x" * 40}])
+
+    assert len(attempts) == 2
+    assert limiter.acquired == [21, 21]
+
+
+def test_normalize_tags_snaps_near_misses_and_drops_unknown_tags():
+    tags = ["main idea / central theme", "Inference from Texts", "Quantum Chromodynamics", "Main Idea / Central Theme"]
+
+    assert pipeline.pipeline.normalize_tags(tags, "reading") == ["Main Idea / Central Theme", "Inference from Text"]
+
+
+def test_batch_tagging_accepts_question_numbers_as_strings(monkeypatch):
+    content = '{"results": [{"index": "1", "tags": ["Tone and Attitude"]}, {"index": 0, "tags": ["Vocabulary in Context"]}, {"index": "two", "tags": []}]}'
+    monkeypatch.setattr(pipeline.pipeline, "_chat_completion", lambda **kwargs: content)
+
+    tags = pipeline.pipeline.tag_questions_batch(["q0", "q1", "q2"], "reading")
+
+    assert tags == [["Vocabulary in Context"], ["Tone and Attitude"], ["untagged"]]
+
+
+def test_only_replies_with_usable_questions_are_cached(tmp_path, monkeypatch):
+    replies = ['{"questions": []}', json.dumps({"questions": [{
+        "question_text": "What is 2 + 2?", "options": {"A": "3", "B": "4"}, "correct": "B", "tags": ["Linear Equations"]}]})]
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        return reply(replies[min(len(calls), len(replies)) - 1])
+
+    monkeypatch.setattr(pipeline.pipeline, "RESPONSE_CACHE_PATH", str(tmp_path / "responses.sqlite"))
+    monkeypatch.setattr(pipeline.pipeline, "_response_cache", None)
+    monkeypatch.setattr(pipeline.pipeline, "openai", types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create))))
+    monkeypatch.setattr(pipeline.pipeline, "tag_questions_batch", lambda texts, section: [["untagged"] for _ in texts])
+
+    def generate():
+        return pipeline.pipeline.generate_mcqs("chunk", "easy", "math", num_questions=1)
+
+    assert generate() == []
+    assert len(generate()) == 1  # the empty reply wasn't cached, so this asks again
+    assert len(generate()) == 1
+    assert len(calls) == 2
+    pipeline.pipeline._response_cache.close()
+
+
+def test_multi_generation_keeps_only_requested_combinations():
+    content = json.dumps({"questions": [
+        {"section": "Math", "difficulty": "easy", "question_text": "a", "options": {"A": "1", "B": "2"}, "correct": "A", "tags": []},
+        {"section": "math", "difficulty": "hard", "question_text": "b", "options": {"A": "1", "B": "2"}, "correct": "A", "tags": []},
+        {"section": "reading", "difficulty": "medium", "question_text": "c", "options": {"A": "1", "B": "2"}, "correct": "A", "tags": []},
+    ]})
+
+    parsed = pipeline.pipeline.parse_generated_questions(content, ["math", "writing"], ["easy", "medium"])
+
+    assert [(q.section, q.difficulty, q.question_text) for q in parsed] == [("math", "easy", "a")]
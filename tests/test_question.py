@@ -0,0 +1,91 @@
+import pytest
+
+from Question import Question, load_columns, questions_from_columns, questions_from_jsonl, questions_to_columns, questions_to_jsonl, save_columns
+from tests.conftest import model_question
+
+
+def test_well_formed_question_passes_through():
+    question, problem = Question.from_model_output(model_question())
+
+    assert problem is None
+    assert question.correct == "B"
+    assert question.options == {"A": "1", "B": "2", "C": "3", "D": "4"}
+    assert question.tags == ["Linear Equations and Inequalities"]
+
+
+def test_options_list_becomes_lettered_keys():
+    question, _ = Question.from_model_output(model_question(options=["1", "2", "3", "4"]))
+
+    assert question.options == {"A": "1", "B": "2", "C": "3", "D": "4"}
+
+
+def test_option_keys_are_normalized():
+    question, _ = Question.from_model_output(model_question(options={"a)": "1", "b.": "2", "c": "3"}, correct="b"))
+
+    assert question.options == {"A": "1", "B": "2", "C": "3"}
+    assert question.correct == "B"
+
+
+@pytest.mark.parametrize("correct", ["B)", "B. 2", "b: two", "2"])
+def test_correct_answer_is_mapped_back_to_its_key(correct):
+    question, problem = Question.from_model_output(model_question(correct=correct))
+
+    assert problem is None
+    assert question.correct == "B"
+
+
+def test_tags_are_snapped_onto_the_section_tags():
+    question, _ = Question.from_model_output(model_question(tags=["linear equations & inequalities", "Made-up tag"]))
+
+    assert question.tags == ["Linear Equations and Inequalities"]
+
+
+def test_section_and_difficulty_come_from_the_request():
+    question, _ = Question.from_model_output(model_question(section="art", difficulty="?"), section="math", difficulty="Hard")
+
+    assert (question.section, question.difficulty) == ("math", "hard")
+
+
+@pytest.mark.parametrize("data, reason", [
+    ("not a dict", "not an object"),
+    (model_question(question_text="  "), "missing question_text"),
+    (model_question(section="history"), "unknown section"),
+    (model_question(difficulty="trivial"), "unknown difficulty"),
+    (model_question(options="A or B"), "options is not an object"),
+    (model_question(options={"A": "1", "B": ""}), "fewer than two non-empty options"),
+    (model_question(correct="E"), "is not one of the options"),
+])
+def test_unrepairable_questions_are_rejected_with_a_reason(data, reason):
+    question, problem = Question.from_model_output(data)
+
+    assert question is None
+    assert reason in problem
+
+
+def test_columnar_round_trip(tmp_path):
+    questions = [
+        Question.from_model_output(model_question(text=f"Question {n}?", difficulty=difficulty))[0]
+        for n, difficulty in enumerate(["easy", "hard", "medium"])
+    ]
+    questions[1].tags = ["Linear Equations and Inequalities", "Systems of Linear Equations"]
+    questions[2].duplicate_of = questions[0].question_id
+    questions[2].image_url = "https://storage.example/figure.png"
+    path = str(tmp_path / "bank.columns.json")
+
+    save_columns(questions, path)
+    loaded = load_columns(path)
+
+    assert [q.to_dict() for q in loaded] == [q.to_dict() for q in questions]
+    columns = questions_to_columns(questions)
+    assert columns["_tags"] == ["Linear Equations and Inequalities", "Systems of Linear Equations"]
+    assert columns["tags"] == [[0], [0, 1], [0]]
+    assert [q.to_dict() for q in questions_from_columns(columns)] == [q.to_dict() for q in questions]
+
+
+def test_jsonl_round_trip(tmp_path):
+    questions = [Question.from_model_output(model_question(text=f"Question {n}?"))[0] for n in range(3)]
+    path = str(tmp_path / "bank.jsonl")
+
+    questions_to_jsonl(questions, path)
+
+    assert [q.to_dict() for q in questions_from_jsonl(path)] == [q.to_dict() for q in questions]
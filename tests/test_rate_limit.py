@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from pipeline import rate_limit
+from pipeline.rate_limit import RateLimiter, TokenBucket, call_with_retries, estimate_tokens, is_retryable
+
+
+class ApiError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    """Records backoff delays instead of sleeping through them."""
+    delays = []
+    monkeypatch.setattr(rate_limit.time, "sleep", delays.append)
+    return delays
+
+
+def test_bucket_hands_out_its_capacity_then_waits_for_refill():
+    bucket = TokenBucket(capacity=10, period=1.0)
+
+    started = time.monotonic()
+    bucket.acquire(10)
+    assert time.monotonic() - started < 0.05
+    bucket.acquire(2)  # 2 tokens at 10/s
+    assert time.monotonic() - started >= 0.15
+
+
+def test_request_larger_than_the_bucket_does_not_wait_forever():
+    bucket = TokenBucket(capacity=5, period=60.0)
+
+    bucket.acquire(500)
+
+    assert bucket.tokens == pytest.approx(0, abs=0.01)
+
+
+def test_limiter_takes_one_request_and_the_estimated_tokens():
+    limiter = RateLimiter(requests_per_minute=100, tokens_per_minute=1000)
+
+    limiter.acquire(400)
+
+    assert limiter.requests.tokens == pytest.approx(99, abs=0.01)
+    assert limiter.tokens.tokens == pytest.approx(600, abs=0.1)
+
+
+def test_estimate_counts_text_and_reserves_images():
+    text_only = [{"role": "user", "content": "x" * 400}]
+    with_image = [{"role": "user", "content": [{"type": "text", "text": "x" * 400}, {"type": "image_url", "image_url": {"url": "u"}}]}]
+
+    assert estimate_tokens(text_only) == 101
+    assert estimate_tokens(with_image) == 101 + 765
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (ApiError(429), True),
+    (ApiError(503), True),
+    (ApiError(400), False),
+    (type("APITimeoutError", (Exception,), {})(), True),
+    (ValueError("bad"), False),
+])
+def test_retryable_errors(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_retryable_errors_are_retried_until_success(no_sleep):
+    attempts = []
+
+    def flaky(x):
+        attempts.append(x)
+        if len(attempts) < 3:
+            raise ApiError(429)
+        return x * 2
+
+    assert call_with_retries(flaky, 21, max_retries=5) == 42
+    assert len(attempts) == 3
+    assert len(no_sleep) == 2
+
+
+def test_non_retryable_error_is_raised_at_once(no_sleep):
+    def broken():
+        raise ApiError(400)
+
+    with pytest.raises(ApiError):
+        call_with_retries(broken)
+    assert no_sleep == []
+
+
+def test_gives_up_after_max_retries(no_sleep):
+    def down():
+        raise ApiError(503)
+
+    with pytest.raises(ApiError):
+        call_with_retries(down, max_retries=3, base_delay=1.0, max_delay=2.0)
+    assert len(no_sleep) == 3
+    assert all(0 <= delay <= 2.0 for delay in no_sleep)
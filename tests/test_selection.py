@@ -0,0 +1,38 @@
+import pytest
+
+from config.settings import SECTION_TAGS
+from pipeline.selection import boilerplate_reason, select_chunks
+
+EXERCISES = "Exercise Set 4.2 " + " ".join(f"{i} Solve {i}x + 3 = {i + 7} for x" for i in range(1, 12))
+DATA_LIST = "72, 85, 90, 85, 61, 77, 85, 90, 72, 64, 85, 93, 70 What is the mode? The mode is the most frequent value."
+CONTENTS = "Table of Contents " + " ".join(f"Chapter {i} Topic {i} {i * 12}" for i in range(1, 8)).replace("Topic", "Linear")
+DOT_LEADERS = "1 Algebra . . . . . 3 2 Geometry . . . . . 19 3 Data Analysis . . . . . 44"
+INDEX = "Index absolute value, 12, 45 algebra, 3, 7, 9 angle, 88, 92 area, 101, 130 axis, 55 bar graph, 140, 141"
+FRONT_MATTER = "Copyright 2024 Example Press. All rights reserved. ISBN 978-0-00-000000-0 Printed in the USA."
+
+
+@pytest.mark.parametrize("chunk", [EXERCISES, DATA_LIST])
+def test_numbered_content_is_not_boilerplate(chunk):
+    assert boilerplate_reason(chunk) is None
+
+
+@pytest.mark.parametrize("chunk, reason", [
+    (CONTENTS, "table of contents"),
+    (DOT_LEADERS, "table of contents"),
+    (INDEX, "index"),
+    (FRONT_MATTER, "front matter"),
+])
+def test_front_and_back_matter_is_recognized(chunk, reason):
+    assert boilerplate_reason(chunk) == reason
+
+
+def test_nothing_is_dropped_without_a_budget():
+    assert select_chunks([CONTENTS, EXERCISES, INDEX, DATA_LIST], "math") == [0, 1, 2, 3]
+
+
+def test_budget_drops_boilerplate_and_keeps_started_chunks():
+    chunks = [CONTENTS, EXERCISES, INDEX, DATA_LIST, FRONT_MATTER]
+    no_questions = [0] * len(SECTION_TAGS["math"])
+
+    assert select_chunks(chunks, "math", budget=5, tag_counts=no_questions) == [1, 3]
+    assert select_chunks(chunks, "math", budget=1, done=[3], tag_counts=no_questions) == [3]
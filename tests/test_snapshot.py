@@ -0,0 +1,68 @@
+import pytest
+
+from database.snapshot import BankSnapshot
+
+
+def document(n: int, section: str = "math", difficulty: str = "easy", tags=("Linear Equations and Inequalities",)) -> dict:
+    return {"question_id": f"q{n}", "question_text": f"Question {n}?", "section": section, "difficulty": difficulty, "tags": list(tags)}
+
+
+def store(bank, *documents):
+    bank.write([[("quiz_questions", d["question_id"], d)] for d in documents])
+
+
+def test_refresh_exports_everything_then_only_newer_documents(tmp_path, bank):
+    store(bank, *(document(n) for n in range(3)))
+    path = str(tmp_path / "snapshot" / "bank.jsonl")
+
+    assert BankSnapshot(path).refresh() == 3
+
+    store(bank, document(3))
+    store(bank, dict(document(1), difficulty="hard"))
+    snapshot = BankSnapshot(path)
+    assert len(snapshot) == 3
+    assert snapshot.refresh() == 2  # only q1 and q3 changed since the last sync
+
+    reloaded = BankSnapshot(path)
+    assert len(reloaded) == 4
+    assert reloaded.questions["q1"]["difficulty"] == "hard"
+    assert reloaded.last_updated_at == max(q["updated_at"] for q in reloaded.questions.values())
+    assert reloaded.refresh(full=True) == 4
+
+
+def snapshot_of(tmp_path, questions: list) -> BankSnapshot:
+    snapshot = BankSnapshot(str(tmp_path / "bank.jsonl"))
+    snapshot.questions = {q["question_id"]: q for q in questions}
+    snapshot._build_indexes()
+    return snapshot
+
+
+def test_indexes_answer_wildcard_lookups(tmp_path):
+    snapshot = snapshot_of(tmp_path, [
+        document(0), document(1, difficulty="hard"), document(2, section="reading", tags=["Tone and Attitude"]),
+    ])
+
+    assert snapshot.count() == 3
+    assert snapshot.count(section="math") == 2
+    assert snapshot.count(difficulty="hard") == 1
+    assert snapshot.question_ids(tag="Tone and Attitude") == ("q2",)
+    assert snapshot.count(section="writing") == 0
+
+
+def test_sample_quiz_fills_the_blueprint_without_reusing_questions(tmp_path):
+    snapshot = snapshot_of(tmp_path, [document(n, difficulty="hard" if n < 4 else "easy") for n in range(10)])
+    blueprint = [{"section": "math", "difficulty": "hard", "count": 4}, {"section": "math", "count": 6}]
+
+    quiz = snapshot.sample_quiz(blueprint, seed=7)
+
+    assert len(quiz) == 10
+    assert len({q["question_id"] for q in quiz}) == 10
+    assert all(q["difficulty"] == "hard" for q in quiz[:4])
+    assert [q["question_id"] for q in snapshot.sample_quiz(blueprint, seed=7)] == [q["question_id"] for q in quiz]
+
+
+def test_sample_quiz_rejects_a_blueprint_it_cannot_fill(tmp_path):
+    snapshot = snapshot_of(tmp_path, [document(n) for n in range(3)])
+
+    with pytest.raises(ValueError):
+        snapshot.sample_quiz([{"section": "math", "count": 4}])
@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+import database.local
+from database.storage import StorageBackend, question_writes, upload_questions
+from Question import Question
+from tests.conftest import model_question
+
+
+class RecordingTarget:
+    """Stands in for Firestore in sync(): commits every group in batches of two."""
+
+    name = "recording"
+
+    def __init__(self):
+        self.documents = {}
+
+    def write(self, groups: list, on_commit=None):
+        for start in range(0, len(groups), 2):
+            for writes in groups[start:start + 2]:
+                for path, document_id, data in writes:
+                    self.documents[f"{path}/{document_id}"] = data
+            if on_commit:
+                on_commit(groups[start:start + 2])
+
+
+def question(**fields) -> Question:
+    return Question.from_model_output(model_question(**fields))[0]
+
+
+def test_storage_backend_is_abstract():
+    with pytest.raises(TypeError):
+        StorageBackend()
+
+
+def test_question_is_indexed_under_each_tag_and_stored_once():
+    q = question(tags=["Linear Equations and Inequalities", "Systems of Linear Equations"])
+
+    question_id, writes = question_writes(q)
+
+    assert question_id == q.question_id
+    assert [path for path, _, _ in writes] == [
+        "SAT/math/easy/Linear-Equations-and-Inequalities/questions",
+        "SAT/math/easy/Systems-of-Linear-Equations/questions",
+        "quiz_questions",
+    ]
+
+
+def test_local_bank_syncs_every_document_once(bank):
+    question_ids = upload_questions([question(text=f"What is {i} + {i}?") for i in range(5)])
+    target = RecordingTarget()
+
+    assert bank.sync(target) == 10
+    assert {f"quiz_questions/{qid}" for qid in question_ids} <= set(target.documents)
+    assert bank.sync(target) == 0
+    assert all(entry["unsynced"] == 0 for entry in bank.stats().values())
+
+
+def test_sync_uploads_local_figures_and_rewrites_their_url(bank, tmp_path, monkeypatch):
+    image_dir = tmp_path / "images"
+    image_dir.mkdir()
+    figure = image_dir / ("c" * 64 + ".png")
+    figure.write_bytes(b"\x89PNG figure")
+    monkeypatch.setattr(database.local, "LOCAL_IMAGE_DIR", str(image_dir))
+    uploads = []
+
+    def upload_image_to_gcs(path):
+        uploads.append(path)
+        return None if "missing" in path else f"https://storage.example/images/{os.path.basename(path)}"
+
+    monkeypatch.setattr("image_question_generation.upload_image_to_gcs", upload_image_to_gcs)
+    ok_id, failed_id = upload_questions([
+        question(text="What does the figure show?", image_url=str(figure)),
+        question(text="What does the other figure show?", image_url=str(image_dir / "missing.png")),
+    ])
+    target = RecordingTarget()
+
+    bank.sync(target)
+
+    assert target.documents[f"quiz_questions/{ok_id}"]["image_url"] == f"https://storage.example/images/{figure.name}"
+    assert f"quiz_questions/{failed_id}" not in target.documents
+    assert uploads == [str(figure)]
@@ -0,0 +1,114 @@
+import itertools
+import threading
+import time
+
+import pytest
+
+from pipeline.checkpoint import manifest_for
+from pipeline.dedup import DuplicateIndex
+from pipeline.streaming import Stage, StreamingPipeline, run_streaming
+
+
+def test_items_flow_through_every_stage():
+    pipeline = StreamingPipeline([
+        Stage("double", lambda x: [x, x], workers=3),
+        Stage("square", lambda x: [x * x], workers=2),
+    ], queue_size=2)
+
+    assert sorted(pipeline.run(range(10))) == sorted([x * x for x in range(10)] * 2)
+    assert [stage.processed for stage in pipeline.stages] == [10, 20]
+
+
+def test_failing_item_is_dropped_and_the_rest_keep_flowing():
+    def parse(x):
+        if x % 3 == 0:
+            raise ValueError(f"bad item {x}")
+        return [x]
+
+    stage = Stage("parse", parse, workers=2)
+    outputs = StreamingPipeline([stage]).run(range(9))
+
+    assert sorted(outputs) == [1, 2, 4, 5, 7, 8]
+    assert (stage.processed, stage.failed) == (9, 3)
+
+
+class InterruptedPipeline(StreamingPipeline):
+    """Simulates Ctrl-C arriving while the caller waits for the first results."""
+
+    def __init__(self, stages, interrupt_after: int):
+        super().__init__(stages, queue_size=2)
+        self.remaining = interrupt_after
+
+    def _get(self, q):
+        if q is self.queues[-1]:
+            if self.remaining == 0:
+                raise KeyboardInterrupt
+            self.remaining -= 1
+        return super()._get(q)
+
+
+def test_interrupt_stops_intake_and_workers_exit():
+    pipeline = InterruptedPipeline([
+        Stage("slow", lambda x: (time.sleep(0.01), [x])[1], workers=2),
+        Stage("pass", lambda x: [x], workers=2),
+    ], interrupt_after=3)
+
+    with pytest.raises(KeyboardInterrupt):
+        pipeline.run(itertools.count())  # endless input: only the interrupt ends the run
+
+    assert pipeline.stop.is_set()
+    assert pipeline.stages[-1].processed >= 3
+    deadline = time.monotonic() + 5
+    names = ("slow-", "pass-", "feeder")
+    while any(t.name.startswith(names) for t in threading.enumerate()) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not any(t.name.startswith(names) for t in threading.enumerate())
+
+
+def stored_questions(bank) -> list:
+    return list(bank.iter_quiz_questions())
+
+
+def test_run_streaming_uploads_and_checkpoints_every_unit(make_pdf, chat, bank, isolated):
+    source = make_pdf(pages=2)
+
+    uploaded = run_streaming([source], "math", extract_workers=1, generate_workers=2)
+
+    assert uploaded == len(stored_questions(bank)) > 0
+    assert len(manifest_for(source, "math")) == uploaded  # one question per chunk x difficulty
+    assert len(DuplicateIndex.load(str(isolated / "dedup_index.npz"))) == uploaded
+
+    calls = chat.calls
+    assert run_streaming([source], "math", extract_workers=1) == 0
+    assert chat.calls == calls
+
+
+def test_unusable_reply_leaves_units_pending(make_pdf, chat, bank):
+    source = make_pdf(pages=2)
+    chat.reply = "Sorry, I can't help with that."
+
+    assert run_streaming([source], "math", extract_workers=1) == 0
+    assert len(manifest_for(source, "math")) == 0
+
+    chat.reply = None
+    uploaded = run_streaming([source], "math", extract_workers=1)
+    assert uploaded > 0
+    assert len(manifest_for(source, "math")) == uploaded
+
+
+def test_failed_upload_leaves_no_phantom_ids_in_the_dedup_index(make_pdf, chat, bank, isolated, monkeypatch):
+    source = make_pdf(pages=2)
+
+    def unavailable(groups):
+        raise ConnectionError("bank unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(bank, "write", unavailable)
+        assert run_streaming([source], "math", extract_workers=1) == 0
+
+    assert len(DuplicateIndex.load(str(isolated / "dedup_index.npz"))) == 0
+    assert len(manifest_for(source, "math")) == 0
+
+    uploaded = run_streaming([source], "math", extract_workers=1)
+    assert uploaded == len(stored_questions(bank)) > 0
+    assert len(DuplicateIndex.load(str(isolated / "dedup_index.npz"))) == uploaded